@@ -3,8 +3,20 @@ import base64
 import gradio as gr
 
 from pdf2md import pdf_md_transformer
+from pdf2md.hp_pdf2md import hp
 
-model = pdf_md_transformer()
+# the transformer of the last profile used, the models of a single profile
+# stay loaded, e.g. one paddleocr instance
+transformer = None
+
+
+def get_transformer(profile=hp.profile):
+    global transformer
+    if transformer is None or transformer.profile != profile:
+        # release the models of the previous profile before loading new ones
+        transformer = None
+        transformer = pdf_md_transformer(profile=profile)
+    return transformer
 
 
 def pdf2base64(file):
@@ -24,14 +36,19 @@ def pdf2base64(file):
             return f"PDF文件加载失败: {e}"
 
 
-def update_markdown(pdf_path):
+def update_markdown(pdf_path, profile, target_language):
+    model = get_transformer(profile)
     types, clips = model.predict(pdf_path)
-    text_list = model.clean_text(types, clips)
+    # translate in the same llm pass, each block is followed by its translation
+    target_language = None if target_language == "不翻译" else target_language
+    text_list = model.clean_text(types, clips, target_language=target_language)
 
     return "\n\n".join(text_list)
 
 
 def translate(current_language, target_language, text):
+    # any profile can translate, keep the models of the current one
+    model = transformer or get_transformer()
     return model.translate(current_language, target_language, text)
 
 
@@ -42,6 +59,14 @@ with gr.Blocks() as demo:
         with gr.Column():
             with gr.Tab(label="PDF to Markdown"):
                 input_pdf = gr.File(label="上传PDF文件")
+                profile_dropbox = gr.Dropdown(
+                    hp.valid_profiles,
+                    value=hp.profile,
+                    label="速度/质量档位",
+                )
+                target_language_dropbox = gr.Dropdown(
+                    ["不翻译", "en", "zh"], value="不翻译", label="同时翻译为"
+                )
 
                 output_md = gr.TextArea(
                     placeholder="从上传PDF文件开始...",
@@ -67,7 +92,11 @@ with gr.Blocks() as demo:
     input_pdf.change(pdf2base64, inputs=input_pdf, outputs=output_pdf)
 
     # update the markdown text
-    transform_btn.click(update_markdown, inputs=input_pdf, outputs=output_md)
+    transform_btn.click(
+        update_markdown,
+        inputs=[input_pdf, profile_dropbox, target_language_dropbox],
+        outputs=output_md,
+    )
     translate_btn.click(
         translate,
         inputs=[current_dropbox, target_dropbox, input_text],
@@ -0,0 +1,158 @@
+import argparse
+import os
+
+from pdf2md.hp_pdf2md import hp
+
+
+def convert(args):
+    from pdf2md import pdf_md_transformer
+    from pdf2md.runtime import set_thread_budget
+
+    set_thread_budget(num_workers=args.num_workers, num_threads=args.num_threads)
+    model = pdf_md_transformer(profile=args.profile)
+    types, clips = model.predict(
+        args.pdf, page_num=args.pages, start_page=args.start_page
+    )
+    blocks = model.clean_text(
+        types,
+        clips,
+        document_path=args.document,
+        target_language=args.target_language,
+    )
+    text = "\n\n".join(blocks)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(text)
+    print(model.gate.report())
+
+
+def render(args):
+    from pdf2md.document import load_document
+
+    document = load_document(args.document)
+    if args.format == "markdown":
+        text = document.to_markdown(args.variant)
+    else:
+        text = document.to_text()
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def shard_submit(args):
+    from pdf2md.others.pdf2imgs import pdf_images_transformer
+    from pdf2md.shard import plan_shards, sqlite_work_queue
+
+    job_id = args.job_id or os.path.splitext(os.path.basename(args.pdf))[0]
+    page_count = pdf_images_transformer().page_count(args.pdf)
+    ranges = plan_shards(page_count, args.shard_size)
+    sqlite_work_queue(args.queue).put(job_id, os.path.abspath(args.pdf), ranges)
+    print(f"job {job_id}: {page_count} pages in {len(ranges)} units")
+
+
+def shard_work(args):
+    from pdf2md import pdf_md_transformer
+    from pdf2md.runtime import set_thread_budget
+    from pdf2md.shard import shard_worker, sqlite_work_queue
+
+    set_thread_budget(num_workers=args.num_workers, num_threads=args.num_threads)
+    worker = shard_worker(
+        sqlite_work_queue(args.queue),
+        transformer=pdf_md_transformer(profile=args.profile),
+        shards_saved_path=args.shards_saved_path,
+    )
+    done = worker.run(max_units=args.max_units)
+    print(f"worker {worker.worker_id}: {done} units done")
+
+
+def shard_merge(args):
+    from pdf2md.shard import merge_shards, sqlite_work_queue
+
+    merge_shards(sqlite_work_queue(args.queue), args.job_id, args.output)
+    print(f"job {args.job_id} merged to {args.output}")
+
+
+def add_model_arguments(parser):
+    parser.add_argument(
+        "--profile",
+        choices=hp.valid_profiles,
+        default=hp.profile,
+        help="speed/quality profile, the hp settings by default",
+    )
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=hp.num_workers,
+        help="conversions running at once on this host",
+    )
+    parser.add_argument(
+        "--num-threads",
+        type=int,
+        default=hp.num_threads,
+        help="cpu threads of this worker, cpu count / num workers by default",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="convert pdf to markdown")
+    commands = parser.add_subparsers(required=True)
+
+    parser_convert = commands.add_parser(
+        "convert", help="convert a pdf on this machine"
+    )
+    parser_convert.add_argument("pdf")
+    parser_convert.add_argument("-o", "--output", default="output.md")
+    parser_convert.add_argument("--start-page", type=int, default=0)
+    parser_convert.add_argument("--pages", type=int, default=None)
+    parser_convert.add_argument(
+        "--document", default=None, help="save the document model to a jsonl file"
+    )
+    parser_convert.add_argument(
+        "--target-language",
+        default=None,
+        help="correct and translate each block in the same llm request",
+    )
+    add_model_arguments(parser_convert)
+    parser_convert.set_defaults(func=convert)
+
+    parser_render = commands.add_parser(
+        "render", help="render a saved document model without running any model"
+    )
+    parser_render.add_argument("document", help="jsonl file saved by convert")
+    parser_render.add_argument("-o", "--output", default="output.md")
+    parser_render.add_argument(
+        "--format", choices=["markdown", "text"], default="markdown"
+    )
+    parser_render.add_argument("--variant", choices=hp.valid_variants, default="source")
+    parser_render.set_defaults(func=render)
+
+    parser_submit = commands.add_parser(
+        "shard-submit", help="split a pdf into page ranges for the workers"
+    )
+    parser_submit.add_argument("pdf")
+    parser_submit.add_argument("--queue", required=True, help="sqlite queue file")
+    parser_submit.add_argument("--job-id", default=None)
+    parser_submit.add_argument("--shard-size", type=int, default=hp.shard_size)
+    parser_submit.set_defaults(func=shard_submit)
+
+    parser_work = commands.add_parser(
+        "shard-work", help="process page ranges until the queue is empty"
+    )
+    parser_work.add_argument("--queue", required=True, help="sqlite queue file")
+    parser_work.add_argument("--shards-saved-path", default=hp.shards_saved_path)
+    parser_work.add_argument("--max-units", type=int, default=None)
+    add_model_arguments(parser_work)
+    parser_work.set_defaults(func=shard_work)
+
+    parser_merge = commands.add_parser(
+        "shard-merge", help="merge the page ranges of a job into one markdown"
+    )
+    parser_merge.add_argument("job_id")
+    parser_merge.add_argument("--queue", required=True, help="sqlite queue file")
+    parser_merge.add_argument("-o", "--output", default="output.md")
+    parser_merge.set_defaults(func=shard_merge)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import re
+
+from .hp_pdf2md import hp
+
+SENTENCE_END = tuple(".!?:;。！？：；")
+REFERENCE_START = re.compile(r"^\s*(\[\d+\]|\d+\.\s)")
+
+
+class markdown_assembler:
+    """
+    Turn ordered ocr blocks into markdown without any llm.
+
+    Lines are joined into paragraphs, hyphenated words are restored,
+    paragraphs split across columns or pages are merged, titles become
+    headings by their line height and references become a list.
+    """
+
+    def __init__(
+        self,
+        drop_types=hp.assembler_drop_types,
+        max_heading_level=hp.max_heading_level,
+        size_tolerance=hp.heading_size_tolerance,
+    ):
+        self.drop_types = drop_types
+        self.max_heading_level = max_heading_level
+        self.size_tolerance = size_tolerance
+
+    def join_lines(self, lines):
+        """
+        join ocred lines into one paragraph, removing line break hyphens
+
+        - input:
+            - lines (list of str): the ocred lines
+        - return:
+            - text (str): the joined text
+        """
+        text = ""
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if text.endswith("-") and line[:1].islower():
+                text = text[:-1] + line
+            elif text:
+                text += " " + line
+            else:
+                text = line
+        return text
+
+    def is_continuation(self, previous, text):
+        """
+        check if `text` continues the paragraph `previous`
+        """
+        if not previous or not text:
+            return False
+        if previous.endswith("-"):
+            return True
+        return not previous.endswith(SENTENCE_END) and text[:1].islower()
+
+    def merge_paragraphs(self, previous, text):
+        """
+        merge two parts of a paragraph
+        """
+        return self.join_lines([previous, text])
+
+    def line_height(self, lines, box):
+        """
+        the mean line height of a block, 0 if the box is unknown
+        """
+        if box is None:
+            return 0
+        return (box[3] - box[1]) / max(len(lines), 1)
+
+    def heading_levels(self, blocks):
+        """
+        map the line heights of the titles to heading levels
+
+        - input:
+            - blocks (list of (type, lines, box)): the ordered blocks
+        - return:
+            - levels (dict): line height -> heading level
+        """
+        sizes = {
+            self.line_height(lines, box)
+            for type, lines, box in blocks
+            if type == "title"
+        }
+        sizes = sorted(sizes, reverse=True)
+        levels, level, reference = {}, 1, None
+        for size in sizes:
+            if reference is None:
+                reference = size
+            elif size < reference * (1 - self.size_tolerance):
+                level = min(level + 1, self.max_heading_level)
+                reference = size
+            levels[size] = level
+        return levels
+
+    def split_references(self, lines):
+        """
+        split the lines of a reference block into entries
+
+        - input:
+            - lines (list of str): the ocred lines
+        - return:
+            - entries (list of str): one joined string per reference
+        """
+        entries = []
+        for line in lines:
+            if not entries or REFERENCE_START.match(line):
+                entries.append([line])
+            else:
+                entries[-1].append(line)
+        return [self.join_lines(entry) for entry in entries]
+
+    def render(self, type, lines, box, levels):
+        """
+        render a single block to markdown
+
+        - return:
+            - text (str): the markdown of the block
+        """
+        if type in ("figure", "table"):
+            return f"![{type}]({hp.clips_saved_path})\n\n"
+        text = self.join_lines(lines)
+        if not text:
+            return ""
+        if type == "title":
+            level = levels.get(self.line_height(lines, box), self.max_heading_level)
+            return "#" * level + " " + text
+        elif type == "reference":
+            return "\n".join("- " + entry for entry in self.split_references(lines))
+        elif type == "equation":
+            return "$$\n" + text + "\n$$"
+        return text
+
+    def assemble(self, blocks, refined=None):
+        """
+        assemble the blocks of a document
+
+        - inputs:
+            - blocks (list of (type, lines, box)): the blocks in reading order,
+              lines are the ocred lines and box is [xmin, ymin, xmax, ymax]
+            - refined (dict): block index -> markdown, e.g. cleaned by the llm,
+              used as is instead of the local rendering
+        - return:
+            - txt_list (list of str): the markdown blocks
+        """
+        refined = refined or {}
+        levels = self.heading_levels(blocks)
+        txt_list = []
+        # index in txt_list of the paragraph later text may continue
+        open_paragraph = None
+
+        for idx, (type, lines, box) in enumerate(blocks):
+            if type in self.drop_types:
+                # running headers and footers don't break a paragraph
+                continue
+            if idx in refined:
+                txt_list.append(refined[idx])
+                open_paragraph = None
+                continue
+            text = self.render(type, lines, box, levels)
+            if not text:
+                continue
+            if type == "text" and open_paragraph is not None:
+                previous = txt_list[open_paragraph]
+                if self.is_continuation(previous, text):
+                    txt_list[open_paragraph] = self.merge_paragraphs(previous, text)
+                    continue
+            txt_list.append(text)
+            open_paragraph = len(txt_list) - 1 if type == "text" else None
+        return txt_list
@@ -0,0 +1,270 @@
+import json
+
+import numpy as np
+
+from .assembler import markdown_assembler
+from .hp_pdf2md import hp
+
+
+def label_name(type_id, labels):
+    """
+    the type name of a type id, ids after `hp.id2label` index `labels`
+    """
+    if type_id < len(hp.id2label):
+        return hp.id2label[type_id].replace(" ", "_")
+    return labels[type_id - len(hp.id2label)]
+
+
+class page_record:
+    """
+    The intermediate state of one page, stored column by column.
+
+    Block i of the page has the box `boxes[i]`, the type `type_ids[i]`, the
+    index `order[i]` given by the layout detector and the ocred lines
+    `lines[line_offsets[i] : line_offsets[i + 1]]` with their scores. The
+    blocks are stored in reading order. Types the layout detector gives
+    outside of `hp.id2label`, e.g. "list" of a PubLayNet model, are kept in
+    `labels`.
+    """
+
+    def __init__(
+        self,
+        page_num,
+        boxes,
+        type_ids,
+        order,
+        line_offsets,
+        lines,
+        line_scores,
+        llm,
+        translations=None,
+        labels=None,
+    ):
+        self.page_num = page_num
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        self.type_ids = np.asarray(type_ids, dtype=np.int8)
+        self.order = np.asarray(order, dtype=np.int32)
+        self.line_offsets = np.asarray(line_offsets, dtype=np.int32)
+        self.lines = list(lines)
+        self.line_scores = np.asarray(line_scores, dtype=np.float32)
+        # the llm output of each block, None if the block skipped the llm
+        self.llm = list(llm)
+        # the translation of each block, None if it wasn't translated
+        self.translations = list(translations or [None] * len(self.llm))
+        self.labels = list(labels or [])
+
+    def __len__(self):
+        return len(self.type_ids)
+
+    def type(self, idx):
+        """
+        the type name of a block, as given by the layout detector
+        """
+        return label_name(int(self.type_ids[idx]), self.labels)
+
+    def block_lines(self, idx):
+        start, end = self.line_offsets[idx], self.line_offsets[idx + 1]
+        return self.lines[start:end]
+
+    def block_scores(self, idx):
+        start, end = self.line_offsets[idx], self.line_offsets[idx + 1]
+        return self.line_scores[start:end]
+
+    def to_json(self):
+        return {
+            "page_num": self.page_num,
+            "boxes": self.boxes.tolist(),
+            "type_ids": self.type_ids.tolist(),
+            "order": self.order.tolist(),
+            "line_offsets": self.line_offsets.tolist(),
+            "lines": self.lines,
+            "line_scores": [round(float(score), 4) for score in self.line_scores],
+            "llm": self.llm,
+            "translations": self.translations,
+            "labels": self.labels,
+        }
+
+
+class page_builder:
+    """
+    Collect the blocks of a page one by one, then freeze them to a page_record.
+    """
+
+    def __init__(self, page_num):
+        self.page_num = page_num
+        self.boxes, self.type_ids, self.order = [], [], []
+        self.line_offsets, self.lines, self.line_scores = [0], [], []
+        self.llm, self.translations = [], []
+        self.labels = []
+
+    def type_id(self, type):
+        """
+        the id of a type, unknown types are added to the labels of the page
+        """
+        label = type.replace("_", " ")
+        if label in hp.label2id:
+            return hp.label2id[label]
+        if type not in self.labels:
+            self.labels.append(type)
+        return len(hp.id2label) + self.labels.index(type)
+
+    def add(self, type, box, order, lines, scores, llm=None, translation=None):
+        """
+        add a block in reading order
+
+        - inputs:
+            - type: str, the type of the block
+            - box: [xmin, ymin, xmax, ymax], the box of the block
+            - order: int, the index given by the layout detector
+            - lines: list of str, the ocred lines
+            - scores: list of float, the confidence scores of the lines
+            - llm: str, the llm output, None if the block skipped the llm
+            - translation: str, the translation of the block
+        - return:
+            - idx: int, the index of the block in the page
+        """
+        self.boxes.append([0, 0, 0, 0] if box is None else box)
+        self.type_ids.append(self.type_id(type))
+        self.order.append(-1 if order is None else order)
+        self.lines.extend(lines)
+        self.line_scores.extend(float(score) for score in scores)
+        self.line_offsets.append(len(self.lines))
+        self.llm.append(llm)
+        self.translations.append(translation)
+        return len(self.llm) - 1
+
+    def type_name(self, idx):
+        return label_name(self.type_ids[idx], self.labels)
+
+    def block_lines(self, idx):
+        return self.lines[self.line_offsets[idx] : self.line_offsets[idx + 1]]
+
+    def build(self):
+        return page_record(
+            self.page_num,
+            self.boxes,
+            self.type_ids,
+            self.order,
+            self.line_offsets,
+            self.lines,
+            self.line_scores,
+            self.llm,
+            self.translations,
+            self.labels,
+        )
+
+
+class document_model:
+    """
+    The pages of a converted document, written to a jsonl file page by page.
+
+    Markdown or plain text are rendered from the stored ocr and llm outputs,
+    without running any model again.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.pages = []
+        if path is not None:
+            # start a new file, pages are appended as soon as they are done
+            open(path, "w", encoding="utf-8").close()
+
+    def add_page(self, page):
+        """
+        add a finished page and append it to the file
+        """
+        self.pages.append(page)
+        if self.path is not None:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(page.to_json(), ensure_ascii=False) + "\n")
+
+    def blocks(self, variant="source"):
+        """
+        the blocks of the document for the assembler
+
+        - input:
+            - variant: str, "source" uses the llm outputs, "translated" the
+              translations and "bilingual" the source followed by its translation
+        - return:
+            - blocks: list of (type, lines, box), in reading order
+            - refined: dict, block index -> llm output
+        """
+        if variant not in hp.valid_variants:
+            raise ValueError(f"invalid variant, selcet one of {hp.valid_variants}")
+        blocks, refined = [], {}
+        assembler = markdown_assembler()
+        for page in self.pages:
+            for idx in range(len(page)):
+                type, lines = page.type(idx), page.block_lines(idx)
+                if not lines and type not in ("table", "figure"):
+                    continue
+                source, translation = page.llm[idx], page.translations[idx]
+                if translation is not None and variant == "translated":
+                    source = translation
+                elif translation is not None and variant == "bilingual":
+                    if source is None:
+                        source = assembler.join_lines(lines)
+                    source = source + "\n\n" + translation
+                if source is not None:
+                    refined[len(blocks)] = source
+                blocks.append((type, lines, page.boxes[idx].tolist()))
+        return blocks, refined
+
+    def to_markdown(self, variant="source", assembler=None):
+        """
+        render the document to markdown
+
+        - input:
+            - variant: str, "source", "translated" or "bilingual"
+            - assembler: markdown_assembler, the assembler of the blocks
+        - return:
+            - text: str, the markdown
+        """
+        assembler = assembler or markdown_assembler()
+        blocks, refined = self.blocks(variant)
+        return "\n\n".join(assembler.assemble(blocks, refined))
+
+    def to_text(self, drop_types=hp.assembler_drop_types):
+        """
+        render the document to plain text from the ocr lines
+
+        - input:
+            - drop_types: list of str, the block types left out
+        - return:
+            - text: str, one paragraph per block
+        """
+        assembler = markdown_assembler()
+        paragraphs, previous_type = [], None
+        for type, lines, _ in self.blocks()[0]:
+            if type in drop_types:
+                continue
+            text = assembler.join_lines(lines)
+            if type in ("table", "figure") or not text:
+                previous_type = type
+                continue
+            if type == previous_type == "text" and assembler.is_continuation(
+                paragraphs[-1], text
+            ):
+                paragraphs[-1] = assembler.merge_paragraphs(paragraphs[-1], text)
+            else:
+                paragraphs.append(text)
+            previous_type = type
+        return "\n\n".join(paragraphs)
+
+
+def load_document(path):
+    """
+    load a document saved by `document_model`
+
+    - input:
+        - path: str, the jsonl file
+    - return:
+        - document: document_model, the loaded document
+    """
+    document = document_model()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                document.pages.append(page_record(**json.loads(line)))
+    document.path = path
+    return document
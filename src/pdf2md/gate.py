@@ -0,0 +1,128 @@
+import os
+import re
+from collections import Counter
+
+from .hp_pdf2md import hp
+
+# ocr often reads the apostrophe of "model's" as a curly one
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)?")
+VOWELS = set("aeiouyAEIOUY")
+
+
+class llm_gate:
+    """
+    Decide from the ocr result whether a block needs the llm to be cleaned.
+
+    Blocks with confident ocr scores and mostly real words pass straight
+    through, the others are sent to the llm.
+    """
+
+    def __init__(
+        self,
+        thresholds=hp.gate_thresholds,
+        min_line_score=hp.gate_min_line_score,
+        min_word_ratio=hp.gate_min_word_ratio,
+        dictionary_path=hp.gate_dictionary_path,
+    ):
+        self.thresholds = thresholds
+        self.min_line_score = min_line_score
+        self.min_word_ratio = min_word_ratio
+        self.dictionary_path = dictionary_path
+        self._dictionary = None
+        # per block type, how many blocks were sent to the llm or skipped it
+        self.llm_calls = Counter()
+        self.avoided = Counter()
+
+    @property
+    def dictionary(self):
+        if self._dictionary is None:
+            self._dictionary = set()
+            if self.dictionary_path and os.path.exists(self.dictionary_path):
+                with open(self.dictionary_path, encoding="utf-8") as f:
+                    self._dictionary = {line.strip().lower() for line in f}
+        return self._dictionary
+
+    def is_word(self, word):
+        """
+        check if an ocred word looks like a real word
+        """
+        if self.dictionary:
+            return word.lower().replace("’", "'") in self.dictionary
+        # without a dictionary, reject what ocr typically produces from noise
+        if len(word) > 1 and not VOWELS.intersection(word) and not word.isupper():
+            return False
+        return word.islower() or word.isupper() or word.istitle()
+
+    def word_ratio(self, text):
+        """
+        the ratio of the tokens looking like real words
+
+        - input:
+            - text (str): the ocred text
+        - return:
+            - ratio (float): 1.0 if the text has no token
+        """
+        tokens = text.split()
+        if not tokens:
+            return 1.0
+        good = 0
+        for token in tokens:
+            token = token.strip(".,;:!?()[]{}\"'`“”‘’-–—*")
+            if not token or token.isdigit():
+                good += 1
+                continue
+            # compounds like "self-attention" are good if every part is
+            good += all(self.is_part_word(part) for part in token.split("-"))
+        return good / len(tokens)
+
+    def is_part_word(self, part):
+        """
+        check a token or a part of a hyphenated token
+        """
+        if part.isdigit():
+            return True
+        # letters glued with digits or symbols, e.g. "th1s" or "w@rd"
+        if not WORD_PATTERN.fullmatch(part):
+            return False
+        return self.is_word(part)
+
+    def need_llm(self, obj_type, texts, scores):
+        """
+        check if a block needs the llm and update the counters
+
+        - input:
+            - obj_type (str): the type of the block
+            - texts (list of str): the ocred lines
+            - scores (list of float): the confidence scores of the lines
+        - return:
+            - bool: True if the block should be sent to the llm
+        """
+        threshold = self.thresholds.get(obj_type)
+        if threshold is None or not scores:
+            need = True
+        elif min(scores) < self.min_line_score:
+            need = True
+        elif sum(scores) / len(scores) < threshold:
+            need = True
+        else:
+            need = self.word_ratio(" ".join(texts)) < self.min_word_ratio
+
+        if need:
+            self.llm_calls[obj_type] += 1
+        else:
+            self.avoided[obj_type] += 1
+        return need
+
+    def report(self):
+        """
+        summary of the gate decisions
+
+        - return:
+            - dict: the total and per type numbers of llm calls and avoided calls
+        """
+        return {
+            "llm_calls": sum(self.llm_calls.values()),
+            "avoided": sum(self.avoided.values()),
+            "llm_calls_per_type": dict(self.llm_calls),
+            "avoided_per_type": dict(self.avoided),
+        }
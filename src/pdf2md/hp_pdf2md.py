@@ -29,4 +29,94 @@ class hp:
         "reference": 8,
         "equation": 9,
     }
-    valid_obj_tasks = ["clean_text", "translate"]
+    valid_obj_tasks = ["clean_text", "translate", "clean_translate"]
+    # blocks corrected and translated together in one llm request
+    translate_batch_size = 8
+    # the renderings of a translated document
+    valid_variants = ["source", "translated", "bilingual"]
+
+    # send only the blocks whose ocr looks damaged to the llm, see gate.py
+    llm_gate = True
+    # minimum mean ocr confidence of a block to skip the llm, per type
+    gate_thresholds = {
+        "text": 0.95,
+        "title": 0.97,
+        "figure_caption": 0.95,
+        "table_caption": 0.95,
+        "reference": 0.95,
+    }
+    # types not listed above always go to the llm, e.g. equation needs latex
+    # a single line below this confidence sends the block to the llm
+    gate_min_line_score = 0.8
+    # minimum ratio of dictionary-like words to skip the llm
+    gate_min_word_ratio = 0.9
+    # a word list with one word per line, None uses the spelling heuristic.
+    # a system list like /usr/share/dict/words misses technical words such as
+    # "softmax" and differs between hosts, so the gate would too
+    gate_dictionary_path = None
+
+    # clean the text with the llm, otherwise only the local assembler is used
+    use_llm = True
+    # block types left out of the markdown, with or without the llm, they
+    # are never sent to the llm nor the gate
+    assembler_drop_types = ["header", "footer"]
+    # titles are mapped to heading levels by their line height, largest first
+    max_heading_level = 3
+    # relative difference of line heights still considered the same level
+    heading_size_tolerance = 0.15
+
+    # pages per work unit when sharding a document across workers
+    shard_size = 50
+    # seconds before a claimed unit of a silent worker is handed out again
+    shard_lease_seconds = 3600
+    # a worker renews the lease of its unit at most this often while working
+    shard_heartbeat_seconds = 60
+    # failed units are retried until this many attempts
+    shard_max_attempts = 3
+    shards_saved_path = "./data/shards/"
+
+    # conversions running at once on this host, the cpu threads are shared by them
+    num_workers = 1
+    # threads per worker for torch, paddle, opencv and blas, None derives it
+    # from the cpu count and num_workers
+    num_threads = None
+    interop_threads = 1
+    # the paddle default, mkldnn is faster on most intel cpus but not on all
+    enable_mkldnn = False
+
+    # zoom of the pages rendered for the layout and the ocr
+    zoom = 2
+    # named speed/quality trade-offs overriding the settings above and the
+    # ones of hp_order and hp_ocr, None keeps them all
+    profile = None
+    valid_profiles = ["fast", "balanced", "accurate"]
+    profiles = {
+        # bulk backfills: small pages, no orientation or angle classifier,
+        # geometric reading order and no llm at all
+        "fast": {
+            "zoom": 1.5,
+            "image_orientation": False,
+            "use_angle_cls": False,
+            "reading_order": "geometric",
+            "use_llm": False,
+        },
+        "balanced": {
+            "zoom": 2,
+            "image_orientation": False,
+            "use_angle_cls": False,
+            "reading_order": "layoutreader",
+            "reading_order_backend": "onnx",
+            "use_llm": True,
+            "llm_gate": True,
+        },
+        # customer-facing uploads: large pages and every block cleaned by the llm
+        "accurate": {
+            "zoom": 4,
+            "image_orientation": True,
+            "use_angle_cls": True,
+            "reading_order": "layoutreader",
+            "reading_order_backend": "torch",
+            "use_llm": True,
+            "llm_gate": False,
+        },
+    }
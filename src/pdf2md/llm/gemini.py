@@ -1,6 +1,3 @@
-# pip install -q -U google-generativeai
-import google.generativeai as genai
-
 from .hp_api import hp
 
 
@@ -10,7 +7,14 @@ class gemini_text_formater:
         self.stream = hp.gemini_stream
         self.api_key = hp.gemini_api_key
         self.model_name = hp.gemini_model_name
-        self.model = self.get_model(self.model_name)
+        self._model = None
+
+    @property
+    def model(self):
+        # the sdk import is slow and the model check needs network, defer them to the first chat
+        if self._model is None:
+            self._model = self.get_model(self.model_name)
+        return self._model
 
     def to_markdown(self, text):
         # copyed from https://ai.google.dev/gemini-api/docs/get-started/tutorial?lang=python
@@ -32,6 +36,9 @@ class gemini_text_formater:
         - return:
             - bool: True if the model is valid, False otherwise
         """
+        # pip install -q -U google-generativeai
+        import google.generativeai as genai
+
         valid_models = [
             m.name.replace("models/", "")
             for m in genai.list_models()
@@ -54,6 +61,7 @@ class gemini_text_formater:
         - return:
             - genai.GenerativeModel: the model object
         """
+        import google.generativeai as genai
 
         # add transport="rest" to fix the proxy and region error
         genai.configure(api_key=self.api_key, transport="rest")
@@ -102,6 +110,9 @@ class gemini_text_formater:
                 prompt = hp.translate_prompt.format(
                     current_language=current_language, target_language=target_language
                 )
+        elif task_type == "clean_translate":
+            target_language = kwargs.get("target_language", None)
+            prompt = hp.clean_translate_prompt.format(target_language=target_language)
         else:
             raise ValueError(f"invalid task_type, select one of {hp.valid_obj_tasks}")
         return prompt
@@ -37,3 +37,13 @@ class hp:
         commen_prompt
         + "the following text is a text from **same paragraph**, please correct it:\n"
     )
+
+    # correct and translate neighbouring blocks in a single request
+    clean_translate_prompt = commen_prompt + (
+        "The following numbered blocks of a paper are extracted by OCR and may "
+        "contain mistakes. For every block, correct it, then translate it to "
+        "{target_language}. For the block n, answer the marker [[n]] alone on "
+        "its line, a newline and the corrected block, then the marker [[n-t]] "
+        "alone on its line, a newline and the translation. Keep a title as a "
+        "markdown heading and an equation in latex:\n\n"
+    )
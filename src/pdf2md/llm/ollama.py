@@ -1,5 +1,3 @@
-import ollama
-
 from .hp_api import hp
 
 
@@ -21,6 +19,8 @@ class ollama_text_formater:
         - return:
             - ollama.Client: the client object
         """
+        import ollama
+
         return ollama.Client(host=host_address)
 
     def clean(self, text):
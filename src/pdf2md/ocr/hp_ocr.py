@@ -1,2 +1,4 @@
 class hp:
     threshold = 200
+    # classify the text direction before recognition, useless for upright scans
+    use_angle_cls = True
@@ -1,15 +1,27 @@
 import cv2 as cv
 from paddleocr import PaddleOCR
 
+from ..runtime import get_thread_budget
 from .hp_ocr import hp
 
 
 class ocr_model:
-    def __init__(self):
+    def __init__(self, use_angle_cls=hp.use_angle_cls):
         """
         Initialize the OCR model
+
+        - inputs:
+            - use_angle_cls: bool, classify the text direction before recognition
         """
-        self.model = PaddleOCR(use_angle_cls=True, lang="en", use_mp=True)
+        budget = get_thread_budget()
+        budget.apply_opencv()
+        self.use_angle_cls = use_angle_cls
+        self.model = PaddleOCR(
+            use_angle_cls=use_angle_cls,
+            lang="en",
+            use_mp=True,
+            **budget.paddle_kwargs(),
+        )
 
     def aug(self, img):
         """
@@ -37,7 +49,7 @@ class ocr_model:
         """
 
         img = self.aug(img)
-        result = self.model.ocr(img, cls=True)[0]
+        result = self.model.ocr(img, cls=self.use_angle_cls)[0]
         texts, scores = [], []
         if result is None:
             pass
@@ -1,9 +1,15 @@
 # copyed from https://github.com/ppaanngggg/layoutreader/blob/main/v3/helpers.py
+from __future__ import annotations
+
 from collections import defaultdict
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List
+
+import numpy as np
 
-import torch
-from transformers import LayoutLMv3ForTokenClassification
+if TYPE_CHECKING:
+    # torch is only needed by the pytorch backend, keep the onnx backend free of it
+    import torch
+    from transformers import LayoutLMv3ForTokenClassification
 
 MAX_LEN = 510
 CLS_TOKEN_ID = 0
@@ -13,6 +19,8 @@ EOS_TOKEN_ID = 2
 
 class DataCollator:
     def __call__(self, features: List[dict]) -> Dict[str, torch.Tensor]:
+        import torch
+
         bbox = []
         labels = []
         input_ids = []
@@ -65,6 +73,8 @@ class DataCollator:
 
 
 def boxes2inputs(boxes: List[List[int]]) -> Dict[str, torch.Tensor]:
+    import torch
+
     bbox = [[0, 0, 0, 0]] + boxes + [[0, 0, 0, 0]]
     input_ids = [CLS_TOKEN_ID] + [UNK_TOKEN_ID] * len(boxes) + [EOS_TOKEN_ID]
     attention_mask = [1] + [1] * len(boxes) + [1]
@@ -75,9 +85,22 @@ def boxes2inputs(boxes: List[List[int]]) -> Dict[str, torch.Tensor]:
     }
 
 
+def boxes2np_inputs(boxes: List[List[int]]) -> Dict[str, np.ndarray]:
+    bbox = [[0, 0, 0, 0]] + boxes + [[0, 0, 0, 0]]
+    input_ids = [CLS_TOKEN_ID] + [UNK_TOKEN_ID] * len(boxes) + [EOS_TOKEN_ID]
+    attention_mask = [1] + [1] * len(boxes) + [1]
+    return {
+        "bbox": np.array([bbox], dtype=np.int64),
+        "attention_mask": np.array([attention_mask], dtype=np.int64),
+        "input_ids": np.array([input_ids], dtype=np.int64),
+    }
+
+
 def prepare_inputs(
     inputs: Dict[str, torch.Tensor], model: LayoutLMv3ForTokenClassification
 ) -> Dict[str, torch.Tensor]:
+    import torch
+
     ret = {}
     for k, v in inputs.items():
         v = v.to(model.device)
@@ -87,16 +110,17 @@ def prepare_inputs(
     return ret
 
 
-def parse_logits(logits: torch.Tensor, length: int) -> List[int]:
+def parse_logits(logits: torch.Tensor | np.ndarray, length: int) -> List[int]:
     """
     parse logits to orders
 
-    :param logits: logits from model
+    :param logits: logits from model, a torch tensor or a numpy array
     :param length: input length
     :return: orders
     """
     logits = logits[1 : length + 1, :length]
-    orders = logits.argsort(descending=False).tolist()
+    # ascending along the last axis, works for both torch and numpy
+    orders = logits.argsort(-1).tolist()
     ret = [o.pop() for o in orders]
     while True:
         order_to_idxes = defaultdict(list)
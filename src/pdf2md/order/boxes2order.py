@@ -1,26 +1,62 @@
+import os
+from contextlib import contextmanager
+
 import cv2 as cv
 import numpy as np
-from paddleocr import PPStructure
-from transformers import LayoutLMv3ForTokenClassification
 
-from .aux import boxes2inputs, parse_logits, prepare_inputs
+from ..runtime import get_thread_budget
+from .aux import boxes2inputs, boxes2np_inputs, parse_logits, prepare_inputs
 from .hp_order import hp
 
 
+@contextmanager
+def atomic_path(path):
+    """
+    write to a temporary file renamed to `path` at the end, so that other
+    processes never load a half written file
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
 class image_layout_detector:
     """
     a class to detect the layout of an image
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        layout_model_dir=hp.layout_model_dir,
+        layout_dict_path=hp.layout_dict_path,
+        image_orientation=hp.image_orientation,
+    ):
         """
         Initialize the layout detector
+
+        - inputs:
+            - layout_model_dir: str, the inference model of the layout, None
+              uses the default of PPStructure
+            - layout_dict_path: str, the labels of `layout_model_dir`
+            - image_orientation: bool, detect the page orientation first
         """
+        from paddleocr import PPStructure
+
+        kwargs = get_thread_budget().paddle_kwargs()
+        if layout_model_dir is not None:
+            kwargs["layout_model_dir"] = layout_model_dir
+        if layout_dict_path is not None:
+            kwargs["layout_dict_path"] = layout_dict_path
         self.table_engine = PPStructure(
             show_log=False,
-            image_orientation=True,
+            image_orientation=image_orientation,
             ocr=False,
             layout=True,
+            **kwargs,
         )
 
     def predict(self, img):
@@ -46,12 +82,49 @@ class image_layout_detector:
         return obj_types, obj_boxes, obj_scores
 
 
+class geometric_reading_order:
+    """
+    A class to sort the boxes in reading order without any model.
+
+    Boxes crossing the middle of the page are full width and start a new
+    section, inside a section the left column is read before the right one.
+    """
+
+    def predict(self, boxes):
+        """
+        predict the reading order of the boxes
+
+        - inputs:
+            boxes: list of [xmin, ymin, xmax, ymax], bboxes of spans
+        - returns:
+            orders: list of int, the indexes of the boxes in reading order
+        """
+        if len(boxes) == 0:
+            return []
+        array = np.array(boxes)
+        middle = (array[:, 0].min() + array[:, 2].max()) / 2
+        full_width = (array[:, 0] < middle) & (array[:, 2] > middle)
+        section_starts = np.sort(array[full_width, 1])
+
+        def key(idx):
+            xmin, ymin = array[idx, 0], array[idx, 1]
+            section = np.searchsorted(section_starts, ymin, side="right")
+            if full_width[idx]:
+                return (section, 0, 0, ymin)
+            return (section, 1, int(xmin >= middle), ymin)
+
+        return sorted(range(len(boxes)), key=key)
+
+
 class LayoutLmForReadingOrder:
     """
     A class to predict the reading order by a list of boxes
     """
 
     def __init__(self, model_name_or_path=hp.model_name_or_path):
+        from transformers import LayoutLMv3ForTokenClassification
+
+        get_thread_budget().apply_torch()
         self.model = LayoutLMv3ForTokenClassification.from_pretrained(
             model_name_or_path,
             use_safetensors=True,
@@ -117,3 +190,108 @@ class LayoutLmForReadingOrder:
             cv.imwrite(save_path, img)
         else:
             return img
+
+
+class OnnxLayoutLmForReadingOrder(LayoutLmForReadingOrder):
+    """
+    Predict the reading order with onnxruntime instead of pytorch.
+
+    The model is exported to onnx once, cached next to the weights and
+    optionally quantized to int8, later runs only need onnxruntime.
+    """
+
+    def __init__(
+        self,
+        model_name_or_path=hp.model_name_or_path,
+        quantize=hp.onnx_quantize,
+    ):
+        import onnxruntime as ort
+
+        onnx_path = self.get_onnx_path(model_name_or_path, quantize)
+        self.session = ort.InferenceSession(
+            onnx_path,
+            sess_options=get_thread_budget().ort_session_options(),
+            providers=["CPUExecutionProvider"],
+        )
+
+    def get_onnx_path(self, model_name_or_path, quantize):
+        """
+        get the cached onnx model, export it at the first time
+
+        - inputs:
+            - model_name_or_path: str, local directory or hub id of the weights
+            - quantize: bool, whether to use the int8 quantized model
+        - returns:
+            - onnx_path: str, the path of the onnx model
+        """
+        if os.path.isdir(model_name_or_path):
+            model_dir = model_name_or_path
+        else:
+            from huggingface_hub import snapshot_download
+
+            model_dir = snapshot_download(model_name_or_path)
+
+        onnx_path = os.path.join(model_dir, hp.onnx_file_name)
+        if not os.path.exists(onnx_path):
+            with atomic_path(onnx_path) as tmp_path:
+                self.export(model_dir, tmp_path)
+        if not quantize:
+            return onnx_path
+
+        quantized_path = os.path.join(model_dir, hp.onnx_quantized_file_name)
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            with atomic_path(quantized_path) as tmp_path:
+                quantize_dynamic(onnx_path, tmp_path, weight_type=QuantType.QInt8)
+        return quantized_path
+
+    def export(self, model_dir, onnx_path):
+        """
+        export the pytorch model to onnx with a dynamic sequence length
+
+        - inputs:
+            - model_dir: str, the directory of the pytorch weights
+            - onnx_path: str, where to save the onnx model
+        """
+        import torch
+        from transformers import LayoutLMv3ForTokenClassification
+
+        model = LayoutLMv3ForTokenClassification.from_pretrained(
+            model_dir,
+            use_safetensors=True,
+        )
+        model.config.return_dict = False
+        model.eval()
+
+        dummy = boxes2inputs([[0, 0, 0, 0]] * 8)
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (dummy["input_ids"], dummy["bbox"], dummy["attention_mask"]),
+                onnx_path,
+                input_names=["input_ids", "bbox", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "bbox": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "logits": {0: "batch", 1: "sequence"},
+                },
+                opset_version=hp.onnx_opset,
+            )
+
+    def predict(self, boxes):
+        """
+        predict the reading order of the boxes
+
+        - inputs:
+            boxes: list of [xmin, ymin, xmax, ymax], bboxes of spans
+        - returns:
+            orders: list of int, the reading order of the boxes
+        """
+        inputs = self.scale(boxes)
+        inputs = boxes2np_inputs(inputs)
+        logits = self.session.run(["logits"], inputs)[0][0]
+        orders = parse_logits(logits, len(boxes))
+        return orders
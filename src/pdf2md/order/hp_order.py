@@ -1,5 +1,23 @@
 class hp:
     model_name_or_path = "hantian/layoutreader"
+    # "layoutreader" predicts the order with a model, "geometric" sorts the
+    # boxes by column and position
+    reading_order = "layoutreader"
+    valid_reading_orders = ["layoutreader", "geometric"]
+    # inference backend of the reading order model
+    backend = "torch"
+    valid_backends = ["torch", "onnx"]
+    onnx_quantize = True
+    onnx_opset = 14
+    onnx_file_name = "layoutreader.onnx"
+    onnx_quantized_file_name = "layoutreader.int8.onnx"
+    # None uses the PicoDet-LCNet layout model bundled with PPStructure
+    layout_model_dir = None
+    # the labels of layout_model_dir, one per line, None for the labels of the
+    # bundled model. a model trained on other labels, e.g. PubLayNet, needs it
+    layout_dict_path = None
+    # detect the page orientation before the layout, useless for upright pages
+    image_orientation = True
     bias = 30
     id2label = {
         0: "text",
@@ -3,3 +3,5 @@ class hp:
     zoom_y = 4
     pdf_path = "../data/pdfs/attention-is-all-your-need.pdf"
     images_saved_path = "../data/images/"
+    # bytes of shared memory the page buffer pool may hold at once
+    pool_budget = 1024 * 1024 * 1024
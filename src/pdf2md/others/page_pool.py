@@ -0,0 +1,258 @@
+import multiprocessing
+import queue
+import time
+from collections import namedtuple
+from multiprocessing import parent_process, resource_tracker, shared_memory
+
+import numpy as np
+
+from .hp_pdf2imgs import hp
+
+# the only thing sent between processes for a page, a few hundred bytes
+page_handle = namedtuple(
+    "page_handle",
+    ["name", "shape", "dtype", "page_num", "boxes"],
+    defaults=[None, None],
+)
+
+# buffers created by the pools of this process, name -> SharedMemory
+_local_buffers = {}
+# buffers closed while a numpy view was still alive, closed again later
+_unclosed = []
+
+
+def as_array(buf, shape, dtype):
+    """
+    a numpy view of a shared buffer
+
+    Unlike `np.ndarray(buffer=...)`, `np.frombuffer` holds the buffer, so
+    closing the buffer fails instead of unmapping memory the view still reads.
+    """
+    dtype = np.dtype(dtype)
+    count = int(np.prod(shape))
+    return np.frombuffer(buf, dtype=dtype, count=count).reshape(shape)
+
+
+def close_buffer(shm):
+    """
+    close a buffer, or keep it until its views are gone
+
+    Dropping a SharedMemory whose buffer is still exported raises in its
+    finalizer, so these buffers are retried at every later close.
+    """
+    _unclosed.append(shm)
+    for shm in list(_unclosed):
+        try:
+            shm.close()
+        except BufferError:
+            continue
+        _unclosed.remove(shm)
+
+
+class page_buffer_pool:
+    """
+    A pool of shared memory buffers holding rendered pages.
+
+    The renderer writes the pixels of a page once, workers in other processes
+    only receive a `page_handle` and read the pixels through a numpy view.
+    Each buffer is reference counted and freed once every consumer released
+    it, new pages wait until the pool is back within its memory budget.
+
+    The pipeline still passes the pages as lists, see `split_pdf`, the pool
+    is the building block for workers reading pages rendered elsewhere.
+    """
+
+    def __init__(self, budget=hp.pool_budget, ctx=None):
+        """
+        - inputs:
+            - budget: int, bytes of shared memory the pool may hold at once
+            - ctx: the multiprocessing context of the consumers, e.g.
+              `multiprocessing.get_context("spawn")`, the default one if None
+        """
+        ctx = ctx or multiprocessing.get_context()
+        self.budget = budget
+        self.used = 0
+        self.buffers = {}
+        self.sizes = {}
+        self.refs = {}
+        # consumers put the name of the buffers they are done with here
+        self.release_queue = ctx.Queue()
+
+    def allocate(self, shape, dtype=np.uint8, page_num=None, refs=1, timeout=None):
+        """
+        allocate a shared buffer, wait for releases if the budget is used up
+
+        - inputs:
+            - shape: tuple of int, the shape of the page array
+            - dtype: the dtype of the page array
+            - page_num: int, the page number stored in the handle
+            - refs: int, how many consumers will release the buffer
+            - timeout: float, seconds to wait for free memory, None waits forever
+        - return:
+            - handle: page_handle, the handle to send to the consumers
+            - array: np.ndarray, a writable view of the buffer
+        """
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if nbytes > self.budget:
+            raise ValueError(
+                f"page of {nbytes} bytes exceeds the pool budget of {self.budget} bytes"
+            )
+        self.wait_for(nbytes, timeout)
+
+        shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        self.buffers[shm.name] = shm
+        self.sizes[shm.name] = nbytes
+        self.refs[shm.name] = refs
+        self.used += nbytes
+        _local_buffers[shm.name] = shm
+
+        handle = page_handle(shm.name, tuple(shape), dtype.str, page_num)
+        array = as_array(shm.buf, shape, dtype)
+        return handle, array
+
+    def put(self, image, page_num=None, boxes=None, refs=1, timeout=None):
+        """
+        copy an image into the pool
+
+        - inputs:
+            - image: np.ndarray, the page to be shared
+            - page_num: int, the page number stored in the handle
+            - boxes: list of [xmin, ymin, xmax, ymax], the layout boxes of the page
+            - refs: int, how many consumers will release the buffer
+            - timeout: float, seconds to wait for free memory
+        - return:
+            - handle: page_handle, the handle of the page
+        """
+        handle, array = self.allocate(image.shape, image.dtype, page_num, refs, timeout)
+        np.copyto(array, image)
+        return handle._replace(boxes=boxes)
+
+    def retain(self, handle, count=1):
+        """
+        add consumers to a buffer, must be called by the process owning the pool
+        """
+        self.refs[handle.name] += count
+
+    def release(self, handle):
+        """
+        release a buffer, the buffer is freed once all consumers released it
+        """
+        self.release_queue.put(handle.name)
+
+    def collect(self, block=False, timeout=None):
+        """
+        handle the pending releases
+
+        - inputs:
+            - block: bool, wait for at least one release
+            - timeout: float, seconds to wait when blocking
+        - return:
+            - freed: int, number of bytes freed
+        """
+        freed = 0
+        while True:
+            try:
+                name = self.release_queue.get(block=block, timeout=timeout)
+            except queue.Empty:
+                return freed
+            block = False
+            if name not in self.refs:
+                continue
+            self.refs[name] -= 1
+            if self.refs[name] <= 0:
+                freed += self.free(name)
+
+    def wait_for(self, nbytes, timeout=None):
+        """
+        block until `nbytes` fit into the budget
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.collect()
+        while self.used + nbytes > self.budget:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"no {nbytes} bytes released within {timeout}s, "
+                        f"{self.used}/{self.budget} bytes in use"
+                    )
+            self.collect(block=True, timeout=remaining)
+
+    def free(self, name):
+        """
+        unlink a buffer regardless of its references
+
+        - return:
+            - nbytes: int, the number of bytes freed
+        """
+        shm = self.buffers.pop(name)
+        _local_buffers.pop(name, None)
+        nbytes = self.sizes.pop(name)
+        self.refs.pop(name)
+        self.used -= nbytes
+        # the name goes away at once, the mapping once the last view is gone
+        close_buffer(shm)
+        shm.unlink()
+        return nbytes
+
+    def close(self):
+        """
+        free all the buffers of the pool
+        """
+        for name in list(self.buffers):
+            self.free(name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class page_view:
+    """
+    Read a shared page in any process, release it when leaving the block.
+
+    >>> with page_view(handle, release_queue) as img:
+    ...     obj_types, obj_boxes, _ = detector.predict(img)
+
+    Don't keep `img` beyond the block, the buffer may be reused afterwards.
+    """
+
+    def __init__(self, handle, release_queue=None):
+        self.handle = handle
+        self.release_queue = release_queue
+        self.shm = None
+
+    def __enter__(self):
+        if self.handle.name in _local_buffers:
+            buf = _local_buffers[self.handle.name].buf
+        else:
+            self.shm = attach(self.handle.name)
+            buf = self.shm.buf
+        return as_array(buf, self.handle.shape, self.handle.dtype)
+
+    def __exit__(self, *exc):
+        if self.shm is not None:
+            close_buffer(self.shm)
+            self.shm = None
+        if self.release_queue is not None:
+            self.release_queue.put(self.handle.name)
+
+
+def attach(name):
+    """
+    attach to a buffer created by another process without taking ownership
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if parent_process() is None:
+            # python < 3.13 registers every attachment and an unrelated process
+            # would unlink the buffer when exiting, only the pool owner may do
+            # that. children of the owner share its tracker and need nothing.
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
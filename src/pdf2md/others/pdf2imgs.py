@@ -22,7 +22,7 @@ class pdf_images_transformer:
         self.images = []
         self.images_saved_path = images_saved_path
 
-    def split_pdf(self, pdf_path, zoom_x=2, zoom_y=2):
+    def split_pdf(self, pdf_path, zoom_x=2, zoom_y=2, pages=None):
         """
         method to split pdf into images
 
@@ -30,12 +30,15 @@ class pdf_images_transformer:
             - pdf_path: str, the path of the pdf file
             - zoom_x: int, the zoom factor in x direction
             - zoom_y: int, the zoom factor in y direction
+            - pages: iterable of int, the pages to be rendered, all pages by default
         - return:
             - images: list of cv.Mat splited from pdf
         """
         images = []
         with fitz.open(pdf_path) as pdf:
-            for page_num in range(pdf.page_count):
+            if pages is None:
+                pages = range(pdf.page_count)
+            for page_num in pages:
                 page = pdf[page_num]
                 image = page.get_pixmap(matrix=fitz.Matrix(zoom_x, zoom_y))
                 image = np.frombuffer(image.samples, dtype=np.uint8).reshape(
@@ -47,6 +50,41 @@ class pdf_images_transformer:
         self.images = images
         return images
 
+    def split_pdf_to_pool(self, pdf_path, pool, zoom_x=2, zoom_y=2, refs=1):
+        """
+        method to render pdf pages straight into a shared page buffer pool
+
+        - inputs:
+            - pdf_path: str, the path of the pdf file
+            - pool: page_buffer_pool, the pool holding the rendered pages
+            - zoom_x: int, the zoom factor in x direction
+            - zoom_y: int, the zoom factor in y direction
+            - refs: int, how many consumers will release each page
+        - return:
+            - handles: generator of page_handle, one per page
+        """
+        with fitz.open(pdf_path) as pdf:
+            for page_num in range(pdf.page_count):
+                page = pdf[page_num]
+                pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom_x, zoom_y))
+                samples = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(
+                    pixmap.h, pixmap.w, pixmap.n
+                )
+                handle, image = pool.allocate(
+                    (pixmap.h, pixmap.w, 3), page_num=page_num, refs=refs
+                )
+                # rgb(a) to bgr, the only copy of the pixels
+                np.copyto(image, samples[..., 2::-1])
+                del image
+                yield handle
+
+    def page_count(self, pdf_path):
+        """
+        method to count the pages of a pdf without rendering them
+        """
+        with fitz.open(pdf_path) as pdf:
+            return pdf.page_count
+
     def save_images(self, images, images_saved_path):
         """
         method to save images splited form pdf
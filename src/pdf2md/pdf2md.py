@@ -1,34 +1,169 @@
+import re
+
 import numpy as np
 from tqdm import tqdm
 
+from .assembler import markdown_assembler
+from .document import document_model, page_builder
+from .gate import llm_gate
 from .hp_pdf2md import hp
-from .llm import gemini_text_formater, ollama_text_formater
-from .ocr.ocr_imgbyimg import ocr_model
-from .order.boxes2order import LayoutLmForReadingOrder, image_layout_detector
-from .others.pdf2imgs import pdf_images_transformer
+from .ocr.hp_ocr import hp as hp_ocr
+from .order.hp_order import hp as hp_order
+from .runtime import get_thread_budget
 
 
 class pdf_md_transformer:
-    def __init__(self) -> None:
-        self.text_formater = self.get_model(hp.platform)
-        self.load_models()
+    def __init__(
+        self,
+        platform=hp.platform,
+        profile=hp.profile,
+    ) -> None:
+        """
+        Initialize the transformer without loading any model.
+
+        Heavy backends (paddleocr, torch, llm sdks) are imported and built on
+        first use, so importing or constructing this class stays cheap. The
+        cpu threads are shared by all the transformers of the process, see
+        `runtime.set_thread_budget`.
+
+        - inputs:
+            - platform: str, the platform of the llm
+            - profile: str, one of `hp.valid_profiles`, None keeps the hp settings
+        """
+        self.platform = platform
+        self.profile = profile
+        self.settings = self.get_settings(profile)
+        self._text_formater = None
+        self.offload_models()
+        self._ocr_model = None
+        self.gate = llm_gate()
+        self.assembler = markdown_assembler()
+        self.types, self.clips, self.boxes = [], [], []
+        self.pages, self.orders = [], []
+        self.document = document_model()
+
+    @property
+    def text_formater(self):
+        if self._text_formater is None:
+            self._text_formater = self.get_model(self.platform)
+        return self._text_formater
+
+    @property
+    def pdf_img_transformer(self):
+        if self._pdf_img_transformer is None:
+            from .others.pdf2imgs import pdf_images_transformer
+
+            self._pdf_img_transformer = pdf_images_transformer()
+        return self._pdf_img_transformer
+
+    @property
+    def image_layout_detecter(self):
+        if self._image_layout_detecter is None:
+            # the thread limits must be set before the backend is imported
+            get_thread_budget()
+            from .order.boxes2order import image_layout_detector
+
+            self._image_layout_detecter = image_layout_detector(
+                layout_model_dir=self.settings["layout_model_dir"],
+                layout_dict_path=self.settings["layout_dict_path"],
+                image_orientation=self.settings["image_orientation"],
+            )
+        return self._image_layout_detecter
+
+    @property
+    def reading_order_aranger(self):
+        if self._reading_order_aranger is None:
+            get_thread_budget()
+            self._reading_order_aranger = self.get_reading_order_model(
+                self.settings["reading_order"],
+                self.settings["reading_order_backend"],
+            )
+        return self._reading_order_aranger
+
+    @property
+    def ocr_model(self):
+        if self._ocr_model is None:
+            get_thread_budget()
+            from .ocr.ocr_imgbyimg import ocr_model
+
+            self._ocr_model = ocr_model(use_angle_cls=self.settings["use_angle_cls"])
+        return self._ocr_model
 
     def offload_models(self):
         """
         Due to the size of the text_formater, this function try offload other model.
+        They are loaded again on next use.
         """
-        del self.pdf_img_transformer
-        del self.image_layout_detecter
-        del self.reading_order_aranger
+        self._pdf_img_transformer = None
+        self._image_layout_detecter = None
+        self._reading_order_aranger = None
 
     def load_models(self):
         """
-        After llm cleaned the text, the method will load model again.
+        Eagerly load all the models, e.g. to warm up a long running service.
+        """
+        self.pdf_img_transformer
+        self.image_layout_detecter
+        self.reading_order_aranger
+        self.ocr_model
+
+    def get_settings(self, profile):
+        """
+        merge the settings of a profile with the hp defaults
+
+        - input:
+            - profile (str), the name of the profile, None for the hp defaults
+        - return:
+            - settings (dict): the settings of the pipeline
+        """
+        settings = {
+            "zoom": hp.zoom,
+            "layout_model_dir": hp_order.layout_model_dir,
+            "layout_dict_path": hp_order.layout_dict_path,
+            "image_orientation": hp_order.image_orientation,
+            "use_angle_cls": hp_ocr.use_angle_cls,
+            "reading_order": hp_order.reading_order,
+            "reading_order_backend": hp_order.backend,
+            "use_llm": hp.use_llm,
+            "llm_gate": hp.llm_gate,
+        }
+        if profile is None:
+            return settings
+        if profile not in hp.profiles:
+            raise ValueError(f"invalid profile, selcet one of {hp.valid_profiles}")
+        settings.update(hp.profiles[profile])
+        return settings
+
+    def get_reading_order_model(self, reading_order, backend):
+        """
+        select the reading order model and its inference backend
+
+        - input:
+            - reading_order (str), "layoutreader" or "geometric"
+            - backend (str), "torch" or "onnx", the backend of layoutreader
+        - return:
+            - reading_order_aranger: the reading order model
         """
-        self.pdf_img_transformer = pdf_images_transformer()
-        self.image_layout_detecter = image_layout_detector()
-        self.reading_order_aranger = LayoutLmForReadingOrder()
-        self.ocr_model = ocr_model()
+        from .order.boxes2order import (
+            LayoutLmForReadingOrder,
+            OnnxLayoutLmForReadingOrder,
+            geometric_reading_order,
+        )
+
+        if reading_order == "geometric":
+            return geometric_reading_order()
+        elif reading_order != "layoutreader":
+            raise ValueError(
+                f"invalid reading order, selcet one of {hp_order.valid_reading_orders}"
+            )
+        if backend == "torch":
+            return LayoutLmForReadingOrder()
+        elif backend == "onnx":
+            return OnnxLayoutLmForReadingOrder()
+        else:
+            raise ValueError(
+                f"invalid backend, selcet one of {hp_order.valid_backends}"
+            )
 
     def get_model(self, platform):
         """
@@ -40,34 +175,199 @@ class pdf_md_transformer:
             - text_formater: the text formater model
         """
         if platform == "gemini":
+            from .llm.gemini import gemini_text_formater
+
             return gemini_text_formater()
         elif platform == "ollama":
+            from .llm.ollama import ollama_text_formater
+
             return ollama_text_formater()
         else:
             raise ValueError(f"invalid platform, selcet one of {hp.valid_platforms}")
 
-    def clean_text(self, types, clips):
-        """
-        append the ocred text to a list.
-        """
-        txt_list = []
-        for type, clip in tqdm(zip(types, clips), total=len(types), colour="green"):
-            if type not in ("table", "figure"):
-                text, _ = self.ocr_model.predict(clip)
-                if text == []:
-                    pass
-                else:
-                    prompt = self.text_formater.get_prompt(
-                        task_type="clean_text",
-                        obj_type=type,
-                    )
-                    pull = self.text_formater.chat(prompt + "\n".join(text).strip())
-                    txt_list.append(pull)
+    def extract_blocks(
+        self,
+        types,
+        clips,
+        boxes=None,
+        document_path=None,
+        target_language=None,
+        callback=None,
+    ):
+        """
+        ocr the objects, clean the damaged ones with the llm.
+
+        With the `use_llm` setting, the text is cleaned by the llm. With `llm_gate`,
+        only the blocks whose ocr looks damaged are, see `self.gate.report()`
+        for the number of avoided llm calls. With `target_language`, every
+        block is corrected and translated in one request instead, batched with
+        its neighbours, see `clean_translate`. Every result is kept in
+        `self.document`, written page by page to `document_path` if given.
+
+        - inputs:
+            - types: list of str, the types of the objects
+            - clips: list of cv.Mat, the objects
+            - boxes: list of [xmin, ymin, xmax, ymax], the boxes of the objects,
+              default to the ones found by the last `predict` if `types` is
+              the list it returned
+            - document_path: str, the jsonl file of the document model
+            - target_language: str, the language to translate the blocks to
+            - callback: callable, called before each block, e.g. to renew a lease
+        - return:
+            - blocks: list of (type, lines, box), the ocred objects
+            - refined: dict, block index -> markdown cleaned by the llm
+        """
+        # the lists returned by the last `predict`, not any of the same length
+        from_predict = types is self.types
+        if boxes is None:
+            boxes = self.boxes if from_predict else [None] * len(types)
+        pages = self.pages if from_predict else [0] * len(types)
+        orders = self.orders if from_predict else [None] * len(types)
+
+        self.document = document_model(document_path)
+        builder, pending = None, []
+        bar = tqdm(
+            zip(types, clips, boxes, pages, orders), total=len(types), colour="green"
+        )
+        for type, clip, box, page_num, order in bar:
+            if callback is not None:
+                callback()
+            if builder is None or builder.page_num != page_num:
+                if builder is not None:
+                    self.flush_translations(builder, pending, target_language)
+                    self.document.add_page(builder.build())
+                builder, pending = page_builder(page_num), []
+            if type in ("table", "figure"):
+                builder.add(type, box, order, [], [])
+                continue
+            text, scores = self.ocr_model.predict(clip)
+            pull = None
+            if text == [] or type in self.assembler.drop_types:
+                pass
+            elif target_language is not None:
+                # translating needs the llm anyway, correct the block in the same pass
+                pending.append(builder.add(type, box, order, text, scores))
+                if len(pending) >= hp.translate_batch_size:
+                    self.flush_translations(builder, pending, target_language)
+                    pending = []
+                continue
+            elif not self.settings["use_llm"]:
+                pass
+            elif self.settings["llm_gate"] and not self.gate.need_llm(
+                type, text, scores
+            ):
+                bar.set_postfix(avoided=sum(self.gate.avoided.values()))
             else:
-                img_md = f"![{type}]({hp.clips_saved_path})\n\n"
-                txt_list.append(img_md)
-        self.load_models()
-        return txt_list
+                prompt = self.text_formater.get_prompt(
+                    task_type="clean_text",
+                    obj_type=type,
+                )
+                pull = self.text_formater.chat(prompt + "\n".join(text).strip())
+            builder.add(type, box, order, text, scores, pull)
+        if builder is not None:
+            self.flush_translations(builder, pending, target_language)
+            self.document.add_page(builder.build())
+        return self.document.blocks()
+
+    def flush_translations(self, builder, pending, target_language):
+        """
+        correct and translate the pending blocks of a page in one request
+
+        - inputs:
+            - builder: page_builder, the page holding the blocks
+            - pending: list of int, the indexes of the blocks in the page
+            - target_language: str, the language to translate the blocks to
+        """
+        if not pending:
+            return
+        batch = [(builder.type_name(idx), builder.block_lines(idx)) for idx in pending]
+        for idx, (source, translation) in zip(
+            pending, self.clean_translate(batch, target_language)
+        ):
+            builder.llm[idx] = source
+            builder.translations[idx] = translation
+
+    def clean_translate(self, batch, target_language):
+        """
+        correct and translate neighbouring blocks in a single llm request
+
+        - inputs:
+            - batch: list of (type, lines), the ocred blocks
+            - target_language: str, the language to translate the blocks to
+        - return:
+            - results: list of (source, translation), the corrected source is
+              None if the llm didn't return it
+        """
+        prompt = self.text_formater.get_prompt(
+            task_type="clean_translate",
+            target_language=target_language,
+        )
+        text = "\n\n".join(
+            f"[[{n}]] ({type})\n" + "\n".join(lines).strip()
+            for n, (type, lines) in enumerate(batch, 1)
+        )
+        pull = self.text_formater.chat(prompt + text)
+        results = self.parse_clean_translate(pull, len(batch))
+        if results is not None:
+            return results
+        if len(batch) > 1:
+            # the numbering got lost, fall back to one request per block
+            return [
+                self.clean_translate([block], target_language)[0] for block in batch
+            ]
+        return [(None, pull.strip())]
+
+    def parse_clean_translate(self, pull, size):
+        """
+        split the answer of a fused request into the blocks
+
+        - inputs:
+            - pull: str, the answer of the llm
+            - size: int, the number of blocks of the request
+        - return:
+            - results: list of (source, translation), None if a block is missing
+        """
+        # the text may start on the marker line, after an echoed "(type)"
+        parts = re.split(
+            r"^\s*\[\[(\d+)(-t)?\]\][ \t]*(?:\([a-z_]+\)[ \t]*)?(.*)$",
+            pull,
+            flags=re.MULTILINE,
+        )
+        sources, translations = {}, {}
+        for n, is_translation, first_line, text in zip(
+            parts[1::4], parts[2::4], parts[3::4], parts[4::4]
+        ):
+            text = (first_line + text).strip()
+            (translations if is_translation else sources)[int(n)] = text or None
+        # an empty translation is missing too, the blocks are asked one by one
+        if any(translations.get(n) is None for n in range(1, size + 1)):
+            return None
+        return [(sources.get(n), translations[n]) for n in range(1, size + 1)]
+
+    def clean_text(
+        self, types, clips, boxes=None, document_path=None, target_language=None
+    ):
+        """
+        ocr the objects and assemble them to a list of markdown blocks.
+
+        The blocks not cleaned by the llm are joined, de-hyphenated and
+        formatted locally by `self.assembler`, see `extract_blocks`.
+
+        - inputs:
+            - types: list of str, the types of the objects
+            - clips: list of cv.Mat, the objects
+            - boxes: list of [xmin, ymin, xmax, ymax], the boxes of the objects
+            - document_path: str, the jsonl file of the document model, the
+              markdown can be rendered again from it by `load_document`
+            - target_language: str, translate the blocks in the same llm pass,
+              each block is then followed by its translation
+        - return:
+            - txt_list: list of str, the markdown blocks
+        """
+        self.extract_blocks(types, clips, boxes, document_path, target_language)
+        variant = "source" if target_language is None else "bilingual"
+        blocks, refined = self.document.blocks(variant)
+        return self.assembler.assemble(blocks, refined)
 
     def translate(self, current_language, target_language, text):
         """
@@ -87,20 +387,31 @@ class pdf_md_transformer:
         pull = self.text_formater.chat(prompt + text)
         return pull
 
-    def predict(self, pdf_path, page_num=None):
+    def predict(self, pdf_path, page_num=None, start_page=0, callback=None):
         """
         predict the text in pdf
 
         - inputs:
             - pdf_path: str, the path of the pdf file
             - page_num: int, the number of pages to be predicted
+            - start_page: int, the first page to be predicted
+            - callback: callable, called before each page, e.g. to renew a lease
         - return:
             - types: list of str, the types of the objects
             - clips: list of cv.Mat, the objects
         """
-        clips, types, _ = [], [], []
-        images = self.pdf_img_transformer.split_pdf(pdf_path)
-        for img in tqdm(images[:page_num], colour="green"):
+        clips, types, boxes, pages, orders = [], [], [], [], []
+        end_page = self.pdf_img_transformer.page_count(pdf_path)
+        if page_num is not None:
+            end_page = min(start_page + page_num, end_page)
+        zoom = self.settings["zoom"]
+        images = self.pdf_img_transformer.split_pdf(
+            pdf_path, zoom_x=zoom, zoom_y=zoom, pages=range(start_page, end_page)
+        )
+        page_nums = range(start_page, end_page)
+        for page_num, img in zip(page_nums, tqdm(images, colour="green")):
+            if callback is not None:
+                callback()
             obj_types, obj_boxes, _ = self.image_layout_detecter.predict(img)
             obj_orders = self.reading_order_aranger.predict(obj_boxes)
             # arange the objects
@@ -108,7 +419,7 @@ class pdf_md_transformer:
             aranged_boxes = np.array(obj_boxes)[obj_orders].tolist()
             # aranged_scores = np.array(obj_scores)[obj_orders].tolist()
 
-            for type, box in zip(aranged_types, aranged_boxes):
+            for type, box, order in zip(aranged_types, aranged_boxes, obj_orders):
                 clip = np.zeros_like(img)
 
                 # TODO 非检测区域都设置为0,期望这样做能够提高ocr准确率,实际效果目测是提升了很多.
@@ -117,7 +428,13 @@ class pdf_md_transformer:
                 ]
                 clips.append(clip)
                 types.append(type)
+                boxes.append(box)
+                pages.append(page_num)
+                orders.append(int(order))
         self.types = types
         self.clips = clips
+        self.boxes = boxes
+        self.pages = pages
+        self.orders = orders
         self.offload_models()
         return types, clips
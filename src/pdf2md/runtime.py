@@ -0,0 +1,144 @@
+import os
+import sys
+
+from .hp_pdf2md import hp
+
+BLAS_ENV_VARS = [
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+]
+
+
+def environ_threads():
+    """
+    the number of threads set in the environment, None if there is none
+    """
+    for name in BLAS_ENV_VARS:
+        value = os.environ.get(name, "")
+        if value.isdigit() and int(value) > 0:
+            return int(value)
+    return None
+
+
+class thread_budget:
+    """
+    The cpu threads one worker may use, shared by every backend.
+
+    Paddle, torch, opencv and blas each size their thread pools to all the
+    cores by default, several conversions on one host then oversubscribe
+    the cpus. The environment variables only work before the libraries are
+    imported, the models are loaded lazily so `apply` comes first.
+
+    Thread variables already in the environment, e.g. OMP_NUM_THREADS set by
+    a scheduler, are kept unless `num_threads` or `num_workers` is given.
+    """
+
+    def __init__(
+        self,
+        num_workers=hp.num_workers,
+        num_threads=hp.num_threads,
+        interop_threads=hp.interop_threads,
+        enable_mkldnn=hp.enable_mkldnn,
+    ):
+        # the defaults are num_threads=None and a single worker
+        self.explicit = num_threads is not None or num_workers != 1
+        if num_threads is None and not self.explicit:
+            num_threads = environ_threads()
+        if num_threads is None:
+            num_threads = max(1, (os.cpu_count() or 1) // max(num_workers, 1))
+        self.num_workers = num_workers
+        self.num_threads = num_threads
+        self.interop_threads = interop_threads
+        self.enable_mkldnn = enable_mkldnn
+
+    def apply(self):
+        """
+        limit the threads of blas and of the backends already imported
+        """
+        for name in BLAS_ENV_VARS:
+            if self.explicit:
+                os.environ[name] = str(self.num_threads)
+            else:
+                os.environ.setdefault(name, str(self.num_threads))
+        self.limit_threadpools()
+        if "torch" in sys.modules:
+            self.apply_torch()
+        if "cv2" in sys.modules:
+            self.apply_opencv()
+
+    def limit_threadpools(self):
+        """
+        limit the blas and openmp pools already loaded, the environment
+        variables only reach the ones loaded later
+        """
+        try:
+            from threadpoolctl import threadpool_limits
+
+            threadpool_limits(limits=self.num_threads)
+        except ImportError:
+            pass
+
+    def apply_torch(self):
+        import torch
+
+        torch.set_num_threads(self.num_threads)
+        try:
+            torch.set_num_interop_threads(self.interop_threads)
+        except RuntimeError:
+            # only allowed before torch ran any parallel work
+            pass
+
+    def apply_opencv(self):
+        import cv2 as cv
+
+        cv.setNumThreads(self.num_threads)
+
+    def paddle_kwargs(self):
+        """
+        the arguments of PaddleOCR and PPStructure
+        """
+        return {"cpu_threads": self.num_threads, "enable_mkldnn": self.enable_mkldnn}
+
+    def ort_session_options(self):
+        """
+        the session options of onnxruntime
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.num_threads
+        options.inter_op_num_threads = self.interop_threads
+        return options
+
+
+_budget = None
+
+
+def set_thread_budget(**kwargs):
+    """
+    set and apply the thread budget of this process, once at the start, e.g.
+    by the command line, since it changes process wide state
+
+    - inputs:
+        - kwargs: the arguments of `thread_budget`
+    - return:
+        - budget: thread_budget, the applied budget
+    """
+    global _budget
+    _budget = thread_budget(**kwargs)
+    _budget.apply()
+    return _budget
+
+
+def get_thread_budget():
+    """
+    the thread budget of this process, the default one is applied at the
+    first call if `set_thread_budget` wasn't called before
+    """
+    if _budget is None:
+        return set_thread_budget()
+    return _budget
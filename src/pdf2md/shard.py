@@ -0,0 +1,368 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+from .assembler import markdown_assembler
+from .hp_pdf2md import hp
+
+# a range of pages [start_page, end_page) of a document, claimed by worker_id
+shard_unit = namedtuple(
+    "shard_unit",
+    ["id", "job_id", "pdf_path", "start_page", "end_page", "attempts", "worker_id"],
+)
+
+
+def plan_shards(page_count, shard_size=hp.shard_size):
+    """
+    split the pages of a document into ranges
+
+    - inputs:
+        - page_count: int, the number of pages of the document
+        - shard_size: int, the number of pages per range
+    - return:
+        - ranges: list of (start_page, end_page)
+    """
+    return [
+        (start, min(start + shard_size, page_count))
+        for start in range(0, page_count, shard_size)
+    ]
+
+
+class lease_lost(RuntimeError):
+    """
+    the unit of a worker was claimed by another worker, its lease expired
+    """
+
+
+class work_queue(ABC):
+    """
+    The interface of the queues distributing shard units to the workers.
+
+    Implementations must make `claim` atomic, so that any number of workers
+    on any number of nodes can share one queue.
+    """
+
+    @abstractmethod
+    def put(self, job_id, pdf_path, ranges):
+        """
+        add the units of a document
+        """
+
+    @abstractmethod
+    def claim(self, worker_id):
+        """
+        take a pending unit, None if there is nothing left to do
+        """
+
+    @abstractmethod
+    def heartbeat(self, unit):
+        """
+        renew the lease of a unit still being processed
+
+        - return:
+            - held: bool, False if the unit was claimed by another worker
+        """
+
+    @abstractmethod
+    def complete(self, unit, output_path):
+        """
+        mark a unit as done with the path of its output, ignored if the unit
+        was claimed again by another worker since
+        """
+
+    @abstractmethod
+    def fail(self, unit, error):
+        """
+        give back a unit which failed, it is retried up to `hp.shard_max_attempts`,
+        ignored if the unit was claimed again by another worker since
+        """
+
+    @abstractmethod
+    def outputs(self, job_id):
+        """
+        the outputs of the units of a document in page order
+
+        - return:
+            - outputs: list of (start_page, end_page, status, output_path)
+        """
+
+
+class sqlite_work_queue(work_queue):
+    """
+    A work queue in a sqlite file, shared by the workers through the filesystem.
+    """
+
+    def __init__(
+        self,
+        path,
+        lease_seconds=hp.shard_lease_seconds,
+        max_attempts=hp.shard_max_attempts,
+    ):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS units (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    pdf_path TEXT NOT NULL,
+                    start_page INTEGER NOT NULL,
+                    end_page INTEGER NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker_id TEXT,
+                    claimed_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    output_path TEXT,
+                    error TEXT
+                )
+                """)
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 60000")
+        return _transaction(conn)
+
+    def put(self, job_id, pdf_path, ranges):
+        with self.connect() as conn:
+            conn.executemany(
+                "INSERT INTO units (job_id, pdf_path, start_page, end_page) "
+                "VALUES (?, ?, ?, ?)",
+                [(job_id, pdf_path, start, end) for start, end in ranges],
+            )
+
+    def claim(self, worker_id):
+        expired = time.time() - self.lease_seconds
+        with self.connect() as conn:
+            # a worker died with the last attempt, nobody will ever retry it
+            conn.execute(
+                "UPDATE units SET status = 'failed', error = 'lease expired' "
+                "WHERE status = 'running' AND claimed_at < ? AND attempts >= ?",
+                (expired, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id, job_id, pdf_path, start_page, end_page, attempts "
+                "FROM units WHERE attempts < ? AND (status = 'pending' "
+                "OR (status = 'running' AND claimed_at < ?)) "
+                "ORDER BY id LIMIT 1",
+                (self.max_attempts, expired),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE units SET status = 'running', worker_id = ?, "
+                "claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (worker_id, time.time(), row[0]),
+            )
+        unit = shard_unit(*row, worker_id)
+        return unit._replace(attempts=unit.attempts + 1)
+
+    def heartbeat(self, unit):
+        with self.connect() as conn:
+            cursor = conn.execute(
+                "UPDATE units SET claimed_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (time.time(), unit.id, unit.worker_id),
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, unit, output_path):
+        with self.connect() as conn:
+            conn.execute(
+                "UPDATE units SET status = 'done', output_path = ?, error = NULL "
+                "WHERE id = ? AND worker_id = ?",
+                (output_path, unit.id, unit.worker_id),
+            )
+
+    def fail(self, unit, error):
+        status = "pending" if unit.attempts < self.max_attempts else "failed"
+        with self.connect() as conn:
+            conn.execute(
+                "UPDATE units SET status = ?, error = ? "
+                "WHERE id = ? AND worker_id = ?",
+                (status, str(error), unit.id, unit.worker_id),
+            )
+
+    def outputs(self, job_id):
+        with self.connect() as conn:
+            return conn.execute(
+                "SELECT start_page, end_page, status, output_path FROM units "
+                "WHERE job_id = ? ORDER BY start_page",
+                (job_id,),
+            ).fetchall()
+
+
+class _transaction:
+    """
+    run the statements of a `with` block in one immediate transaction
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        # take the write lock at once, two workers can't claim the same unit
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, *exc):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.conn.close()
+
+
+class shard_worker:
+    """
+    Process the units of a work queue until it is empty.
+    """
+
+    def __init__(
+        self,
+        queue,
+        transformer=None,
+        shards_saved_path=hp.shards_saved_path,
+        worker_id=None,
+        heartbeat_seconds=hp.shard_heartbeat_seconds,
+    ):
+        self.queue = queue
+        self._transformer = transformer
+        self.shards_saved_path = shards_saved_path
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.heartbeat_seconds = heartbeat_seconds
+        self.last_heartbeat = 0
+
+    @property
+    def transformer(self):
+        if self._transformer is None:
+            from .pdf2md import pdf_md_transformer
+
+            self._transformer = pdf_md_transformer()
+        return self._transformer
+
+    def heartbeat(self, unit):
+        """
+        renew the lease of a unit at most every `heartbeat_seconds`, called
+        after each page and block
+
+        - input:
+            - unit: shard_unit, the unit being processed
+        """
+        now = time.monotonic()
+        if now - self.last_heartbeat < self.heartbeat_seconds:
+            return
+        self.last_heartbeat = now
+        if not self.queue.heartbeat(unit):
+            raise lease_lost(f"unit {unit.id} was claimed by another worker")
+
+    def process(self, unit):
+        """
+        convert the pages of a unit and save the blocks
+
+        - input:
+            - unit: shard_unit, the unit to be processed
+        - return:
+            - output_path: str, the json file holding the blocks of the unit
+        """
+        self.last_heartbeat = time.monotonic()
+        types, clips = self.transformer.predict(
+            unit.pdf_path,
+            page_num=unit.end_page - unit.start_page,
+            start_page=unit.start_page,
+            callback=lambda: self.heartbeat(unit),
+        )
+        blocks, refined = self.transformer.extract_blocks(
+            types, clips, callback=lambda: self.heartbeat(unit)
+        )
+
+        os.makedirs(self.shards_saved_path, exist_ok=True)
+        # one file per claim, a worker which lost its lease and the worker
+        # which took the unit over never write the same file
+        output_path = os.path.join(
+            self.shards_saved_path,
+            f"{unit.job_id}-{unit.start_page:06d}-{unit.end_page:06d}"
+            f"-{unit.worker_id}-{unit.attempts}.json",
+        )
+        # write then rename, a crashed worker never leaves a partial shard
+        with open(output_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "job_id": unit.job_id,
+                    "start_page": unit.start_page,
+                    "end_page": unit.end_page,
+                    "blocks": blocks,
+                    "refined": refined,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(output_path + ".tmp", output_path)
+        return output_path
+
+    def run(self, max_units=None):
+        """
+        claim and process units until the queue is empty
+
+        - input:
+            - max_units: int, stop after this many units, no limit by default
+        - return:
+            - done: int, the number of units processed
+        """
+        done = 0
+        while max_units is None or done < max_units:
+            unit = self.queue.claim(self.worker_id)
+            if unit is None:
+                break
+            try:
+                output_path = self.process(unit)
+            except lease_lost:
+                # the unit belongs to the other worker now
+                continue
+            except Exception as e:
+                self.queue.fail(unit, repr(e))
+                continue
+            self.queue.complete(unit, output_path)
+            done += 1
+        return done
+
+
+def merge_shards(queue, job_id, md_file_path=None, assembler=None):
+    """
+    merge the outputs of the units of a document into one markdown
+
+    The blocks of all units are assembled together, so paragraphs crossing a
+    unit boundary are merged and heading levels are the same in every unit.
+
+    - inputs:
+        - queue: work_queue, the queue the document was processed with
+        - job_id: str, the id of the document
+        - md_file_path: str, where to save the markdown, not saved by default
+        - assembler: markdown_assembler, the assembler of the blocks
+    - return:
+        - text: str, the markdown of the document
+    """
+    outputs = queue.outputs(job_id)
+    if not outputs:
+        raise ValueError(f"no unit found for job {job_id}")
+    unfinished = [(start, end) for start, end, status, _ in outputs if status != "done"]
+    if unfinished:
+        raise RuntimeError(f"job {job_id} has unfinished page ranges: {unfinished}")
+
+    blocks, refined = [], {}
+    for _, _, _, output_path in outputs:
+        with open(output_path, encoding="utf-8") as f:
+            shard = json.load(f)
+        for idx, text in shard["refined"].items():
+            refined[len(blocks) + int(idx)] = text
+        blocks.extend(tuple(block) for block in shard["blocks"])
+
+    assembler = assembler or markdown_assembler()
+    text = "\n\n".join(assembler.assemble(blocks, refined))
+    if md_file_path is not None:
+        with open(md_file_path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return text
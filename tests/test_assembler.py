@@ -0,0 +1,103 @@
+import pytest
+
+from pdf2md.assembler import markdown_assembler
+
+
+@pytest.fixture
+def assembler():
+    return markdown_assembler()
+
+
+def test_join_lines(assembler):
+    lines = ["Transformers rely on at-", "tention, not on recur-", "rence.", " "]
+    assert assembler.join_lines(lines) == (
+        "Transformers rely on attention, not on recurrence."
+    )
+    # a hyphen before a capital is kept, e.g. a name split over two lines
+    assert assembler.join_lines(["Encoder-", "Decoder"]) == "Encoder- Decoder"
+
+
+def test_merge_paragraphs_across_columns_and_pages(assembler):
+    blocks = [
+        ("text", ["A paragraph ending in the left col-"], [0, 0, 50, 10]),
+        ("text", ["umn goes on in the right one and"], [60, 0, 100, 10]),
+        # the page break
+        ("footer", ["1"], [0, 90, 100, 100]),
+        ("header", ["Journal of Tests"], [0, 0, 100, 10]),
+        ("text", ["on the next page."], [0, 20, 100, 30]),
+        ("text", ["A new paragraph."], [0, 40, 100, 50]),
+    ]
+    assert assembler.assemble(blocks) == [
+        "A paragraph ending in the left column goes on in the right one and "
+        "on the next page.",
+        "A new paragraph.",
+    ]
+
+
+def test_figure_breaks_paragraphs(assembler):
+    blocks = [
+        ("text", ["A paragraph before"], [0, 0, 100, 10]),
+        ("figure", [], [0, 20, 100, 40]),
+        ("text", ["a figure."], [0, 50, 100, 60]),
+    ]
+    assert len(assembler.assemble(blocks)) == 3
+
+
+def test_finished_sentence_is_not_continued(assembler):
+    blocks = [
+        ("text", ["The first paragraph."], [0, 0, 100, 10]),
+        ("text", ["lowercase start of the next one."], [0, 20, 100, 30]),
+    ]
+    assert len(assembler.assemble(blocks)) == 2
+
+
+def test_heading_levels(assembler):
+    blocks = [
+        ("title", ["Paper"], [0, 0, 100, 40]),
+        ("title", ["Introduction"], [0, 50, 100, 70]),
+        # within the tolerance of the section titles
+        ("title", ["Method"], [0, 80, 100, 99]),
+        ("title", ["Details"], [0, 100, 100, 112]),
+        ("title", ["More details"], [0, 120, 100, 130]),
+    ]
+    assert assembler.assemble(blocks) == [
+        "# Paper",
+        "## Introduction",
+        "## Method",
+        "### Details",
+        "### More details",
+    ]
+
+
+def test_split_references(assembler):
+    lines = [
+        "[1] A. Author. A paper.",
+        "In a journal, 2020.",
+        "[2] B. Author. Another paper.",
+    ]
+    assert assembler.split_references(lines) == [
+        "[1] A. Author. A paper. In a journal, 2020.",
+        "[2] B. Author. Another paper.",
+    ]
+    blocks = [("reference", lines, None)]
+    assert assembler.assemble(blocks) == [
+        "- [1] A. Author. A paper. In a journal, 2020.\n"
+        "- [2] B. Author. Another paper."
+    ]
+
+
+def test_empty_blocks(assembler):
+    blocks = [("title", [], [0, 0, 100, 10]), ("equation", [" "], None)]
+    assert assembler.assemble(blocks) == []
+
+
+def test_drop_types_win_over_refined(assembler):
+    blocks = [
+        ("header", ["Journal of Tests"], [0, 0, 100, 10]),
+        ("text", ["A paragraph split by the"], [0, 20, 100, 30]),
+        ("footer", ["Page 1"], [0, 90, 100, 100]),
+        ("text", ["running header."], [0, 110, 100, 120]),
+    ]
+    refined = {0: "Journal of Tests", 2: "Page 1"}
+    txt_list = assembler.assemble(blocks, refined)
+    assert txt_list == ["A paragraph split by the running header."]
@@ -0,0 +1,51 @@
+import pytest
+
+from pdf2md.pdf2md import pdf_md_transformer
+
+
+class fake_formater:
+    """
+    answer the fused requests in turn
+    """
+
+    def __init__(self, pulls):
+        self.pulls = list(pulls)
+
+    def get_prompt(self, task_type, **kwargs):
+        return ""
+
+    def chat(self, prompt):
+        return self.pulls.pop(0)
+
+
+@pytest.fixture
+def model():
+    return pdf_md_transformer()
+
+
+def test_text_on_the_marker_line(model):
+    pull = "[[1]] (text)\nHello\n[[1-t]] Bonjour\n\n[[2]]\n# Title\n[[2-t]]\n# Titre"
+    assert model.parse_clean_translate(pull, 2) == [
+        ("Hello", "Bonjour"),
+        ("# Title", "# Titre"),
+    ]
+
+
+def test_echoed_type_hint(model):
+    pull = "[[1]] (text) Hello\n[[1-t]] (text) Bonjour"
+    assert model.parse_clean_translate(pull, 1) == [("Hello", "Bonjour")]
+
+
+def test_empty_translation_falls_back(model):
+    model._text_formater = fake_formater(
+        [
+            "[[1]]\nHello\n[[1-t]]\n\n[[2]]\nWorld\n[[2-t]]\nMonde",
+            "[[1]]\nHello\n[[1-t]]\nBonjour",
+            "[[1]]\nWorld\n[[1-t]]\nMonde",
+        ]
+    )
+    batch = [("text", ["Helo"]), ("text", ["Wrold"])]
+    assert model.clean_translate(batch, "French") == [
+        ("Hello", "Bonjour"),
+        ("World", "Monde"),
+    ]
@@ -0,0 +1,38 @@
+from pdf2md.document import document_model, load_document, page_builder
+
+
+def test_unknown_layout_labels_round_trip(tmp_path):
+    builder = page_builder(0)
+    builder.add("figure_caption", [0, 0, 10, 10], 0, ["Figure 1."], [0.99])
+    builder.add("list", [0, 10, 10, 20], 1, ["first item"], [0.99])
+    assert builder.type_name(1) == "list"
+
+    path = str(tmp_path / "doc.jsonl")
+    document = document_model(path)
+    document.add_page(builder.build())
+    blocks, _ = load_document(path).blocks()
+    assert [type for type, _, _ in blocks] == ["figure_caption", "list"]
+
+
+class fake_ocr:
+    def predict(self, clip):
+        return [clip], [0.99]
+
+
+def test_extract_blocks_only_uses_the_last_predict():
+    from pdf2md.pdf2md import pdf_md_transformer
+
+    model = pdf_md_transformer(profile="fast")
+    model._ocr_model = fake_ocr()
+    # as left by a predict of two pages
+    model.types, model.clips = ["title", "text"], ["Title", "Body."]
+    model.boxes = [[0, 0, 100, 40], [0, 0, 100, 10]]
+    model.pages, model.orders = [0, 1], [0, 0]
+
+    model.extract_blocks(model.types, model.clips)
+    assert [page.page_num for page in model.document.pages] == [0, 1]
+
+    # other lists of the same length don't get the boxes and pages of predict
+    blocks, _ = model.extract_blocks(["text", "text"], ["One.", "Two."])
+    assert [page.page_num for page in model.document.pages] == [0]
+    assert [box for _, _, box in blocks] == [[0, 0, 0, 0], [0, 0, 0, 0]]
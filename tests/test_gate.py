@@ -0,0 +1,38 @@
+import pytest
+
+from pdf2md.gate import llm_gate
+
+
+@pytest.fixture
+def gate():
+    return llm_gate()
+
+
+def test_hyphenated_words_are_words(gate):
+    assert gate.word_ratio("self-attention state-of-the-art models") == 1.0
+    assert gate.word_ratio("encoder-decoder GPT-4") == 1.0
+
+
+def test_apostrophes(gate):
+    assert gate.word_ratio("the model's and the model’s output") == 1.0
+
+
+def test_dictionary(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_text("the\nmodel's\noutput\n", encoding="utf-8")
+    gate = llm_gate(dictionary_path=str(path))
+    assert gate.word_ratio("The model’s output") == 1.0
+    assert gate.word_ratio("The softmax output") == 2 / 3
+
+
+def test_damaged_tokens_are_not_words(gate):
+    assert gate.word_ratio("th1s w@rd a--b xzq") == 0.0
+
+
+def test_clean_block_skips_llm(gate):
+    lines = ["We use self-attention in the encoder-decoder", "architecture."]
+    assert not gate.need_llm("text", lines, [0.99, 0.98])
+    assert gate.need_llm("text", ["Thx qvck brwn fx"], [0.99])
+    assert gate.need_llm("equation", ["x = y"], [1.0])
+    assert gate.report()["avoided"] == 1
+    assert gate.report()["llm_calls"] == 2
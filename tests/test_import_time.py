@@ -0,0 +1,40 @@
+import json
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+
+# backends that must only be imported when a model is used
+HEAVY_MODULES = ["torch", "paddleocr", "cv2", "fitz", "ollama", "google.generativeai"]
+# seconds to import pdf2md and build the transformer, ~0.2s when lazy
+IMPORT_BUDGET = 1.5
+
+CODE = """
+import json, sys, time
+start = time.perf_counter()
+import pdf2md
+pdf2md.pdf_md_transformer()
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def cold_start():
+    result = subprocess.run(
+        [sys.executable, "-c", CODE],
+        cwd=SRC,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_no_heavy_backend_imported():
+    modules = cold_start()["modules"]
+    assert [name for name in HEAVY_MODULES if name in modules] == []
+
+
+def test_cold_start_within_budget():
+    assert cold_start()["elapsed"] < IMPORT_BUDGET
@@ -0,0 +1,96 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from pdf2md.others.page_pool import page_buffer_pool, page_view
+
+START_METHODS = [
+    method
+    for method in ("fork", "spawn")
+    if method in multiprocessing.get_all_start_methods()
+]
+
+
+def read_page(handle, release_queue, results):
+    with page_view(handle, release_queue) as img:
+        results.put((handle.page_num, img.tobytes(), handle.boxes))
+
+
+def wait_released(pool):
+    # the releases go through a queue feeder thread, wait for all of them
+    while pool.used:
+        assert pool.collect(block=True, timeout=10)
+    assert pool.used == 0
+
+
+@pytest.mark.parametrize("method", START_METHODS)
+def test_round_trip(method):
+    ctx = multiprocessing.get_context(method)
+    rng = np.random.default_rng(0)
+    pages = [rng.integers(0, 256, (40, 30, 3), dtype=np.uint8) for _ in range(4)]
+
+    # room for two pages only, the others wait for the releases
+    with page_buffer_pool(budget=2 * pages[0].nbytes, ctx=ctx) as pool:
+        results = ctx.Queue()
+        for page_num, page in enumerate(pages):
+            handle = pool.put(page, page_num=page_num, boxes=[[0, 0, 5, 5]], timeout=10)
+            worker = ctx.Process(
+                target=read_page, args=(handle, pool.release_queue, results)
+            )
+            worker.start()
+            got_num, got_bytes, got_boxes = results.get(timeout=30)
+            worker.join(timeout=30)
+            assert got_num == page_num
+            assert got_bytes == page.tobytes()
+            assert got_boxes == [[0, 0, 5, 5]]
+
+        wait_released(pool)
+        assert pool.buffers == {}
+
+
+def test_budget_timeout():
+    with page_buffer_pool(budget=100) as pool:
+        handle = pool.put(np.zeros(100, dtype=np.uint8))
+        with pytest.raises(TimeoutError):
+            pool.put(np.zeros(100, dtype=np.uint8), timeout=0.1)
+        pool.release(handle)
+        pool.put(np.zeros(100, dtype=np.uint8), timeout=1)
+        assert pool.used == 100
+
+
+def test_split_pdf_to_pool(tmp_path):
+    fitz = pytest.importorskip("fitz")
+    from pdf2md.others.pdf2imgs import pdf_images_transformer
+
+    pdf_path = str(tmp_path / "doc.pdf")
+    with fitz.open() as pdf:
+        for _ in range(2):
+            pdf.new_page(width=100, height=50).insert_text((10, 20), "pdf2md")
+        pdf.save(pdf_path)
+
+    transformer = pdf_images_transformer()
+    expected = transformer.split_pdf(pdf_path)
+    with page_buffer_pool(budget=10 * expected[0].nbytes) as pool:
+        for handle, image in zip(
+            transformer.split_pdf_to_pool(pdf_path, pool), expected
+        ):
+            with page_view(handle, pool.release_queue) as view:
+                assert np.array_equal(view, image)
+        wait_released(pool)
+
+
+def test_free_with_a_live_view():
+    from pdf2md.others import page_pool
+
+    with page_buffer_pool(budget=100) as pool:
+        handle = pool.put(np.arange(100, dtype=np.uint8))
+        with page_view(handle) as img:
+            pool.free(handle.name)
+        # the buffer is unlinked but stays mapped for the view
+        assert pool.used == 0
+        assert img[99] == 99
+        assert len(page_pool._unclosed) == 1
+        del img
+        page_pool.close_buffer(page_pool._unclosed.pop())
+        assert page_pool._unclosed == []
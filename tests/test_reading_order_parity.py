@@ -0,0 +1,56 @@
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+huggingface_hub = pytest.importorskip("huggingface_hub")
+
+from pdf2md.order.boxes2order import (  # noqa: E402
+    LayoutLmForReadingOrder,
+    OnnxLayoutLmForReadingOrder,
+)
+from pdf2md.order.hp_order import hp  # noqa: E402
+
+BOX_SETS = [
+    # title, two columns and a footer
+    [
+        [100, 80, 1100, 160],
+        [100, 200, 580, 700],
+        [620, 200, 1100, 450],
+        [620, 480, 1100, 700],
+        [100, 720, 580, 1400],
+        [620, 720, 1100, 1400],
+        [560, 1480, 640, 1510],
+    ],
+    # single column with a figure and its caption
+    [
+        [150, 100, 1050, 300],
+        [150, 320, 1050, 900],
+        [150, 920, 1050, 980],
+        [150, 1000, 1050, 1500],
+    ],
+]
+
+
+@pytest.fixture(scope="module")
+def model_dir():
+    try:
+        return huggingface_hub.snapshot_download(
+            hp.model_name_or_path, local_files_only=True
+        )
+    except Exception:
+        pytest.skip(f"weights of {hp.model_name_or_path} are not downloaded")
+
+
+@pytest.fixture(scope="module")
+def torch_orders(model_dir):
+    model = LayoutLmForReadingOrder(model_dir)
+    return [model.predict(boxes) for boxes in BOX_SETS]
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_onnx_orders_match_torch(model_dir, torch_orders, quantize):
+    model = OnnxLayoutLmForReadingOrder(model_dir, quantize=quantize)
+    assert [model.predict(boxes) for boxes in BOX_SETS] == torch_orders
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from pdf2md import runtime
+from pdf2md.runtime import BLAS_ENV_VARS, thread_budget
+
+
+@pytest.fixture
+def environ(monkeypatch):
+    # setenv first, so that monkeypatch restores the variables apply() writes
+    for name in BLAS_ENV_VARS:
+        monkeypatch.setenv(name, "")
+        monkeypatch.delenv(name)
+    monkeypatch.setenv("OMP_NUM_THREADS", "3")
+    # leave the thread pools of the test process alone
+    monkeypatch.setattr(thread_budget, "limit_threadpools", lambda self: None)
+    monkeypatch.setattr(runtime, "_budget", None)
+    return os.environ
+
+
+def test_default_budget_keeps_environment(environ):
+    budget = thread_budget()
+    budget.apply()
+    assert budget.num_threads == 3
+    assert environ["OMP_NUM_THREADS"] == "3"
+    assert environ["MKL_NUM_THREADS"] == "3"
+
+
+def test_explicit_budget_overrides_environment(environ):
+    thread_budget(num_threads=2).apply()
+    assert environ["OMP_NUM_THREADS"] == "2"
+
+    budget = thread_budget(num_workers=(os.cpu_count() or 1) + 1)
+    budget.apply()
+    assert budget.num_threads == 1
+    assert environ["OMP_NUM_THREADS"] == "1"
+
+
+def test_transformers_share_the_budget(environ):
+    from pdf2md import pdf_md_transformer
+
+    runtime.set_thread_budget(num_threads=2)
+    pdf_md_transformer(profile="fast")
+    pdf_md_transformer(profile="accurate")
+    assert runtime.get_thread_budget().num_threads == 2
+    assert environ["OMP_NUM_THREADS"] == "2"
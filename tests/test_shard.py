@@ -0,0 +1,147 @@
+import pytest
+
+from pdf2md.shard import (
+    lease_lost,
+    merge_shards,
+    plan_shards,
+    shard_worker,
+    sqlite_work_queue,
+    work_queue,
+)
+
+
+def make_queue(tmp_path, **kwargs):
+    queue = sqlite_work_queue(str(tmp_path / "queue.sqlite"), **kwargs)
+    queue.put("job", "doc.pdf", [(0, 10)])
+    return queue
+
+
+def test_expired_last_attempt_fails(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=-1, max_attempts=1)
+    assert queue.claim("dead") is not None
+    # the lease of the dead worker is over and no attempt is left
+    assert queue.claim("alive") is None
+    assert queue.outputs("job") == [(0, 10, "failed", None)]
+
+
+def test_stale_worker_cannot_overwrite(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=-1, max_attempts=3)
+    stale = queue.claim("stale")
+    fresh = queue.claim("fresh")
+    assert fresh.id == stale.id and fresh.attempts == 2
+
+    queue.fail(stale, "timeout")
+    queue.complete(stale, "stale.json")
+    assert queue.outputs("job") == [(0, 10, "running", None)]
+
+    queue.complete(fresh, "fresh.json")
+    assert queue.outputs("job") == [(0, 10, "done", "fresh.json")]
+
+
+class stub_transformer:
+    """
+    one text block per page, the text of page n is `pages[n]`
+    """
+
+    def __init__(self, pages, refined_pages=()):
+        self.pages = pages
+        self.refined_pages = refined_pages
+        self.callbacks = 0
+
+    def predict(self, pdf_path, page_num=None, start_page=0, callback=None):
+        page_nums = range(start_page, start_page + page_num)
+        for _ in page_nums:
+            callback()
+            self.callbacks += 1
+        return ["text"] * len(page_nums), list(page_nums)
+
+    def extract_blocks(self, types, clips, callback=None):
+        blocks, refined = [], {}
+        for idx, (type, page_num) in enumerate(zip(types, clips)):
+            callback()
+            self.callbacks += 1
+            if page_num in self.refined_pages:
+                refined[idx] = f"**{self.pages[page_num]}**"
+            blocks.append((type, [self.pages[page_num]], [0, 0, 100, 10]))
+        return blocks, refined
+
+
+PAGES = [
+    "A first paragraph.",
+    "A paragraph crossing the",
+    "shard boundary.",
+    "A refined paragraph.",
+    "The end.",
+]
+
+
+def submit(tmp_path, shard_size=2):
+    queue = sqlite_work_queue(str(tmp_path / "queue.sqlite"))
+    queue.put("job", "doc.pdf", plan_shards(len(PAGES), shard_size))
+    return queue
+
+
+def test_worker_and_merge(tmp_path):
+    queue = submit(tmp_path)
+    transformer = stub_transformer(PAGES, refined_pages=[3])
+    worker = shard_worker(
+        queue, transformer, shards_saved_path=str(tmp_path / "shards")
+    )
+    assert worker.run() == 3
+    assert transformer.callbacks == 2 * len(PAGES)
+
+    outputs = queue.outputs("job")
+    assert [(start, end, status) for start, end, status, _ in outputs] == [
+        (0, 2, "done"),
+        (2, 4, "done"),
+        (4, 5, "done"),
+    ]
+    assert all(worker.worker_id in path for *_, path in outputs)
+
+    md_file_path = str(tmp_path / "doc.md")
+    text = merge_shards(queue, "job", md_file_path)
+    assert text == (
+        "A first paragraph.\n\n"
+        "A paragraph crossing the shard boundary.\n\n"
+        "**A refined paragraph.**\n\n"
+        "The end."
+    )
+    with open(md_file_path, encoding="utf-8") as f:
+        assert f.read() == text
+
+
+def test_merge_unfinished(tmp_path):
+    queue = submit(tmp_path)
+    worker = shard_worker(
+        queue, stub_transformer(PAGES), shards_saved_path=str(tmp_path / "shards")
+    )
+    worker.run(max_units=1)
+    with pytest.raises(RuntimeError, match=r"\(2, 4\), \(4, 5\)"):
+        merge_shards(queue, "job")
+    with pytest.raises(ValueError):
+        merge_shards(queue, "other job")
+
+
+def test_lost_lease_stops_the_worker(tmp_path):
+    queue = submit(tmp_path, shard_size=len(PAGES))
+    stale = shard_worker(
+        queue,
+        stub_transformer(PAGES),
+        shards_saved_path=str(tmp_path / "shards"),
+        worker_id="stale",
+        heartbeat_seconds=0,
+    )
+    unit = queue.claim(stale.worker_id)
+    assert queue.heartbeat(unit)
+    # another worker takes the unit over after the lease expired
+    queue.lease_seconds = -1
+    fresh_unit = queue.claim("fresh")
+    assert not queue.heartbeat(unit)
+    with pytest.raises(lease_lost):
+        stale.process(unit)
+    assert queue.heartbeat(fresh_unit)
+
+
+def test_work_queue_is_abstract():
+    with pytest.raises(TypeError):
+        work_queue()